@@ -0,0 +1,83 @@
+"""Times the parts of startup that come before the window is interactive, without a display.
+
+Measures importing the viewer module in a fresh interpreter (and which heavy modules that loads), and
+showing a folder of PDFs from the cached listing against scanning it. Run from the repository root:
+
+    python benchmarks/bench_startup.py --files 2000 --json startup.json
+
+The time to interactive of a real session is recorded by the viewer itself as the 'startup' stage of
+its timing overlay (PDF_VIEWER_PERF=hud, or =trace to write it to a file).
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pdf_core import FolderIndex
+from synthetic import cached_pdf
+
+HEAVY_MODULES = ('fitz', 'numpy', 'PIL.Image', 'PIL.ImageTk')
+IMPORT_PROBE = f"""import json, sys, time
+started = time.perf_counter()
+import pdf_viewer_reload
+print(json.dumps({{'seconds': time.perf_counter() - started, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))"""
+
+def summarize(name, samples, **extra):
+    samples = sorted(s * 1000 for s in samples)
+    result = {'case': name, 'runs': len(samples), 'p50_ms': samples[len(samples) // 2], 'min_ms': samples[0], 'max_ms': samples[-1], **extra}
+    print(f"{name:<24} p50 {result['p50_ms']:9.2f} ms  min {result['min_ms']:9.2f} ms  max {result['max_ms']:9.2f} ms", file=sys.stderr)
+    return result
+
+def bench_import(repeat):
+    samples, loaded = [], None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        probe = json.loads(out.strip().splitlines()[-1])
+        samples.append(probe['seconds'])
+        loaded = probe['loaded']
+    return summarize("import_viewer", samples, heavy_modules_loaded=loaded)
+
+def bench_listing(files, repeat, workdir):
+    folder = os.path.join(workdir, "folder")
+    os.makedirs(folder)
+    source = cached_pdf(pages=1, words_per_page=50, annots_per_page=0)
+    for i in range(files): shutil.copyfile(source, os.path.join(folder, f"doc{i:05d}.pdf"))
+    index = FolderIndex(os.path.join(workdir, "index.sqlite3"))
+    _, stale = index.scan(folder)
+    for name, size, mtime in stale: index.store(folder, name, size, mtime, 1, '', b'')
+    index.commit()
+
+    def timed(run):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            samples.append(time.perf_counter() - started)
+        return samples
+    return [summarize("list_folder_scan", timed(lambda: index.scan(folder)), files=files),
+            summarize("list_folder_cached", timed(lambda: index.cached(folder)), files=files)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PDF viewer's startup path.")
+    parser.add_argument("--files", type=int, default=2000, help="PDFs in the listed folder (default: 2000)")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case (default: 10)")
+    parser.add_argument("--json", help="write the results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="pdf_viewer_startup_")
+    try: results = [bench_import(args.repeat)] + bench_listing(args.files, args.repeat, workdir)
+    finally: shutil.rmtree(workdir, ignore_errors=True)
+    report = {'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results}
+    if args.json:
+        with open(args.json, "w") as f: json.dump(report, f, indent=1)
+    else: json.dump(report, sys.stdout, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Times the viewer's hot paths on synthetic PDFs, without a display.
+
+Every case runs the functions the viewer itself uses for that path (rendering and compositing a page or
+a tile, reading annotations, saving one edit, undo/redo, word hit-testing and find) on PDFs from
+synthetic.py. Each case reports latency percentiles in milliseconds and the peak Python memory of one
+run. Parameters take comma-separated lists and every combination is measured. Run from the repository root:
+
+    python benchmarks/bench_suite.py --pages 20,200 --annots 0,50 --json results.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fitz  # PyMuPDF
+from PIL import Image
+from pdf_core import TextIndex, read_page_annots, save_annots_atomically, write_annots
+from pdf_viewer_reload import SpatialGrid, UndoHistory, annotated_image, np, raster_from_samples
+from synthetic import cached_pdf
+
+TILE_SIZE = 512
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def measure(name, run, repeat, params, setup=None):
+    """Times run(setup()) repeat times, then runs it once more under tracemalloc for the peak memory."""
+    samples = []
+    for i in range(repeat):
+        arg = setup(i) if setup else i
+        start = time.perf_counter()
+        run(arg)
+        samples.append((time.perf_counter() - start) * 1000)
+    arg = setup(repeat) if setup else repeat
+    tracemalloc.start()
+    run(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    samples.sort()
+    result = {'case': name, **params, 'runs': repeat, 'mean_ms': sum(samples) / len(samples),
+              'p50_ms': percentile(samples, 0.5), 'p90_ms': percentile(samples, 0.9), 'p99_ms': percentile(samples, 0.99),
+              'max_ms': samples[-1], 'peak_py_kb': peak // 1024}
+    print(f"{name:<24} {json.dumps(params):<70} p50 {result['p50_ms']:9.3f} ms  p90 {result['p90_ms']:9.3f} ms  "
+          f"max {result['max_ms']:9.3f} ms  peak {result['peak_py_kb']:8d} KB", file=sys.stderr)
+    return result
+
+def new_highlight():
+    rect = fitz.Rect(60, 60, 160, 72)
+    return {'type': 'highlight', 'quads': [rect.quad], 'color': (1, 0, 0), 'rect': rect}
+
+def bench_document(path, params, repeat, workdir, only=None):
+    doc = fitz.open(path)
+    pages = len(doc)
+    annots = [read_page_annots(doc.load_page(p)) for p in range(pages)]
+    words = [doc.load_page(p).get_text("words") for p in range(pages)]
+    results = []
+    def case(name, run, setup=None):
+        if not only or only in name: results.append(measure(name, run, repeat, params, setup))
+
+    # Opening: the old eager scan of every page's annotations against reading only the first page.
+    def open_eager(_):
+        with fitz.open(path) as d: [read_page_annots(page) for page in d]
+    def open_lazy(_):
+        with fitz.open(path) as d: read_page_annots(d.load_page(0))
+    case("open_scan_eager", open_eager)
+    case("open_scan_lazy", open_lazy)
+
+    # Rendering: rasterize and composite the annotations, as render_current_page does before making a PhotoImage.
+    for zoom in (1.0, 2.0):
+        def render(i, zoom=zoom):
+            page = doc.load_page(i % pages)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            base = raster_from_samples(pix.width, pix.height, bytearray(pix.samples_mv))
+            with annotated_image(base, annots[i % pages], zoom) as image: image.size
+        case(f"render_page@{zoom:g}x", render)
+
+    # The first pass of a progressive render: a quarter of the zoom, scaled up to the page's size on screen.
+    def render_preview(i, zoom=2.0, scale=0.25):
+        page = doc.load_page(i % pages)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom * scale, zoom * scale), alpha=False)
+        base = raster_from_samples(pix.width, pix.height, bytearray(pix.samples_mv))
+        size = (page.rect * fitz.Matrix(zoom, zoom)).irect
+        with annotated_image(base, annots[i % pages], zoom * scale) as image: image.resize((size.width, size.height), Image.BILINEAR)
+    case("render_preview@2x", render_preview)
+
+    # A window resize step: the last composited render scaled to the new width instead of rasterizing the page again.
+    pix = doc.load_page(0).get_pixmap(alpha=False)
+    with annotated_image(raster_from_samples(pix.width, pix.height, bytearray(pix.samples_mv)), annots[0], 1.0) as image: last_render = image
+    def rescale(i):
+        width = last_render.width - 10 * (i % 20 + 1)
+        last_render.resize((width, round(last_render.height * width / last_render.width)), Image.BILINEAR)
+    case("resize_rescale", rescale)
+
+    display_lists = {}
+    def render_tile(i, zoom=4.0):
+        page_num = i % pages
+        if page_num not in display_lists: display_lists[page_num] = doc.load_page(page_num).get_displaylist()
+        clip = fitz.Rect(0, 0, TILE_SIZE, TILE_SIZE) / zoom
+        pix = display_lists[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+        base = raster_from_samples(pix.width, pix.height, bytearray(pix.samples_mv))
+        with annotated_image(base, annots[page_num], zoom, origin=(pix.x, pix.y)) as image: image.size
+    case("render_tile@4x", render_tile)
+
+    # Saving one new highlight, in place and through the atomic copy-and-replace.
+    def fresh_copy(i):
+        copy = os.path.join(workdir, f"save-{i}.pdf")
+        shutil.copyfile(path, copy)
+        return copy, {i % pages: annots[i % pages] + [new_highlight()]}
+    case("save_one_edit", lambda arg: write_annots(*arg), fresh_copy)
+    case("save_one_edit_atomic", lambda arg: save_annots_atomically(*arg), fresh_copy)
+
+    # Undo and redo of a single annotation edit with the whole document's annotations loaded.
+    history = UndoHistory(max_depth=1000, max_bytes=64 * 1024 * 1024)
+    def edit_undo_redo(i):
+        page_annots = annots[i % pages]
+        ops = [('add', i % pages, len(page_annots), new_highlight())]
+        history.record(ops); page_annots.append(ops[0][3])
+        history.undo(); page_annots.pop()
+        history.redo(); page_annots.append(ops[0][3])
+        history.undo(); page_annots.pop()
+    case("edit_undo_redo", edit_undo_redo)
+
+    # Word hit-testing for a drag selection: the spatial grid (built once per page, as the viewer caches it) against scanning every word.
+    grids = [SpatialGrid() for _ in range(pages)]
+    for page_num, page_words in enumerate(words):
+        for k, word in enumerate(page_words): grids[page_num].insert(k, word[:4])
+    def selection(i):
+        rng = random.Random(i)
+        x, y = rng.uniform(0, 400), rng.uniform(0, 700)
+        return i % pages, fitz.Rect(x, y, x + 200, y + 40)
+    def hit_grid(arg):
+        page_num, rect = arg
+        grids[page_num].query(*rect)
+    def hit_scan(arg):
+        page_num, rect = arg
+        [w for w in words[page_num] if fitz.Rect(w[:4]).intersects(rect)]
+    case("hit_test_grid", hit_grid, selection)
+    case("hit_test_scan", hit_scan, selection)
+
+    # Find: searching the inverted word index.
+    index = TextIndex()
+    for page_num, page_words in enumerate(words): index.add_page(page_num, page_words)
+    vocabulary = sorted(index.postings)
+    case("find", lambda i: index.search(vocabulary[i * 7 % len(vocabulary)][:3]))
+    doc.close()
+    return results
+
+def parse_list(value, cast=int): return [cast(v) for v in value.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PDF viewer's hot paths on synthetic PDFs.")
+    parser.add_argument("--pages", type=parse_list, default=[20, 200], help="page counts (default: 20,200)")
+    parser.add_argument("--page-size", type=lambda v: parse_list(v, str), default=['a4'], help="letter, a4, a3 or a0 (default: a4)")
+    parser.add_argument("--words", type=parse_list, default=[300], help="words per page (default: 300)")
+    parser.add_argument("--annots", type=parse_list, default=[5, 50], help="annotations per page (default: 5,50)")
+    parser.add_argument("--repeat", type=int, default=30, help="timed runs per case (default: 30)")
+    parser.add_argument("--only", help="run only cases whose name contains this")
+    parser.add_argument("--json", help="write the results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="pdf_viewer_bench_")
+    try:
+        for pages, page_size, words, annots in itertools.product(args.pages, args.page_size, args.words, args.annots):
+            params = {'pages': pages, 'page_size': page_size, 'words_per_page': words, 'annots_per_page': annots}
+            path = cached_pdf(pages, page_size, words, annots)
+            results += bench_document(path, params, args.repeat, workdir, args.only)
+    finally: shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                              'pymupdf': fitz.VersionBind, 'numpy': np.__version__ if np else None},
+              'repeat': args.repeat, 'results': results}
+    if args.json:
+        with open(args.json, "w") as f: json.dump(report, f, indent=1)
+    else: json.dump(report, sys.stdout, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Measures the latency of a single annotation edit as the number of annotations grows.
+
+Compares the old approach of deep-copying every annotation before each edit with the
+operation log in UndoHistory. Run from the repository root:
+
+    python benchmarks/bench_undo.py
+"""
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fitz  # PyMuPDF
+from pdf_viewer_reload import UndoHistory
+
+PAGES = 100
+SIZES = [1000, 5000, 10000, 20000, 50000]
+EDITS = 50
+# Deep copies get slow quickly, so the baseline is sampled with fewer edits and skipped for large sizes.
+DEEPCOPY_EDITS = 3
+DEEPCOPY_MAX_SIZE = 20000
+
+def make_highlight(i):
+    rect = fitz.Rect(50, 50 + i % 700, 150, 62 + i % 700)
+    return {'type': 'highlight', 'quads': [rect.quad], 'color': (1, 1, 0), 'rect': rect}
+
+def make_annots(count):
+    annots = {p: [] for p in range(PAGES)}
+    for i in range(count): annots[i % PAGES].append(make_highlight(i))
+    return annots
+
+def time_deepcopy_edits(annots):
+    undo_stack = []
+    start = time.perf_counter()
+    for i in range(DEEPCOPY_EDITS):
+        undo_stack.append(copy.deepcopy(annots))
+        annots[i % PAGES].append(make_highlight(i))
+    return (time.perf_counter() - start) / DEEPCOPY_EDITS
+
+def time_history_edits(annots):
+    history = UndoHistory(max_depth=1000, max_bytes=64 * 1024 * 1024)
+    start = time.perf_counter()
+    for i in range(EDITS):
+        page_annots = annots[i % PAGES]
+        ops = [('add', i % PAGES, len(page_annots), make_highlight(i))]
+        history.record(ops)
+        page_annots.insert(ops[0][2], ops[0][3])
+    return (time.perf_counter() - start) / EDITS
+
+if __name__ == "__main__":
+    print(f"{'annotations':>12} {'deepcopy ms/edit':>18} {'op log ms/edit':>16}")
+    for size in SIZES:
+        deepcopy_ms = f"{time_deepcopy_edits(make_annots(size)) * 1000:.3f}" if size <= DEEPCOPY_MAX_SIZE else "-"
+        history_ms = time_history_edits(make_annots(size)) * 1000
+        print(f"{size:>12} {deepcopy_ms:>18} {history_ms:>16.4f}")
@@ -0,0 +1,57 @@
+"""Generates reproducible synthetic PDFs for the benchmarks.
+
+The same parameters and seed always give the same text, layout and annotations, so results from
+different runs and machines are comparable.
+"""
+import os
+import random
+import tempfile
+import fitz  # PyMuPDF
+
+PAGE_SIZES = {'letter': (612, 792), 'a4': (595, 842), 'a3': (842, 1191), 'a0': (2384, 3370)}
+FONT_SIZE = 10
+LINE_HEIGHT = 13
+MARGIN = 50
+
+def make_vocabulary(rng, count=2000):
+    return ["".join(rng.choice("etaoinshrdlucmfwypvbgkqjxz") for _ in range(rng.randint(2, 10))) for _ in range(count)]
+
+def make_pdf(path, pages=50, page_size='a4', words_per_page=300, annots_per_page=5, seed=0):
+    """Writes a PDF with pages of random words and, per page, highlights over random words plus a text note for every fifth one."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    width, height = PAGE_SIZES[page_size]
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=width, height=height)
+        words = [rng.choice(vocabulary) for _ in range(words_per_page)]
+        line, y = [], MARGIN
+        for word in words:
+            # Roughly half an em per character.
+            if (len(" ".join(line + [word])) * FONT_SIZE * 0.5 > width - 2 * MARGIN) and line:
+                page.insert_text((MARGIN, y), " ".join(line), fontsize=FONT_SIZE)
+                line, y = [], y + LINE_HEIGHT
+                if y > height - MARGIN: break
+            line.append(word)
+        if line and y <= height - MARGIN: page.insert_text((MARGIN, y), " ".join(line), fontsize=FONT_SIZE)
+
+        placed = page.get_text("words")
+        for i in range(min(annots_per_page, len(placed))):
+            word = rng.choice(placed)
+            if i % 5 == 4: page.add_text_annot(fitz.Point(word[2], word[1]), "note %d" % i)
+            else:
+                annot = page.add_highlight_annot(fitz.Rect(word[:4]))
+                annot.set_colors(stroke=(1, 1, 0)); annot.update()
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+def cached_pdf(pages=50, page_size='a4', words_per_page=300, annots_per_page=5, seed=0):
+    """Returns the path of a synthetic PDF in the temp folder, generating it only once per parameter set."""
+    name = f"synthetic-{pages}p-{page_size}-{words_per_page}w-{annots_per_page}a-{seed}.pdf"
+    path = os.path.join(tempfile.gettempdir(), "pdf_viewer_bench", name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        make_pdf(path + ".tmp", pages, page_size, words_per_page, annots_per_page, seed)
+        os.replace(path + ".tmp", path)
+    return path
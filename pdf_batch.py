@@ -0,0 +1,93 @@
+"""Exports and applies PDF annotations in bulk, without the viewer.
+
+    python pdf_batch.py export FOLDER_OR_PDF... > annots.jsonl
+    python pdf_batch.py apply SPEC.json|SPEC.csv FOLDER_OR_PDF...
+
+Files are processed in parallel by a process pool. Each file prints one JSON line as soon as it is done,
+with its timing in seconds; a summary goes to stderr. Pages are numbered from 1.
+
+An apply spec is a JSON list of annotations in the export format, or a CSV file with the columns
+file, page, type, x0, y0, x1, y1, text, color, search. 'file' is a name or glob matched against each
+file's name (empty: every file), an empty 'page' means every page, 'color' is "#rrggbb" or a JSON list
+of three 0..1 values, and 'search' highlights every occurrence of its text instead of a rectangle.
+"""
+import argparse
+import csv
+import fnmatch
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf_core import apply_annots, export_annots, is_listed_pdf
+
+def iter_pdfs(paths, recursive=False):
+    for path in paths:
+        if not os.path.isdir(path): yield path; continue
+        for folder, dirs, names in os.walk(path):
+            yield from (os.path.join(folder, name) for name in sorted(names) if is_listed_pdf(name))
+            if not recursive: break
+            dirs.sort()
+
+def parse_color(value):
+    if not value: return None
+    if isinstance(value, str) and value.startswith("#"): return tuple(int(value[i:i + 2], 16) / 255 for i in (1, 3, 5))
+    return tuple(json.loads(value) if isinstance(value, str) else value)
+
+def load_spec(path):
+    """Reads an apply spec from a .csv file or a JSON list into annotation entries."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if not path.lower().endswith(".csv"): entries = json.load(f)
+        else:
+            entries = []
+            for row in csv.DictReader(f):
+                entry = {'file': row.get('file') or None, 'page': int(row['page']) if row.get('page') else None,
+                         'type': row.get('type') or 'highlight', 'text': row.get('text') or '', 'search': row.get('search') or None}
+                if row.get('x0'): entry['rect'] = [float(row[c]) for c in ('x0', 'y0', 'x1', 'y1')]
+                entry['color'] = row.get('color')
+                entries.append(entry)
+    for entry in entries: entry['color'] = parse_color(entry.get('color'))
+    return entries
+
+def entries_for(spec, path):
+    name = os.path.basename(path)
+    return [e for e in spec if not e.get('file') or fnmatch.fnmatch(name, e['file'])]
+
+def run_job(command, path, entries):
+    """Processes one file in a worker process and returns its result line."""
+    started = time.perf_counter()
+    try:
+        if command == 'export': result = {'file': path, 'annotations': export_annots(path)}
+        else: result = {'file': path, 'added': apply_annots(path, entries)}
+    except Exception as e: result = {'file': path, 'error': f"{type(e).__name__}: {e}"}
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or apply PDF annotations in bulk.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="also process PDFs in subfolders")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="print every file's highlights and text notes as JSON lines")
+    export.add_argument("paths", nargs="+", help="PDF files or folders")
+    apply = commands.add_parser("apply", help="add the annotations of a JSON or CSV spec to every matching file")
+    apply.add_argument("spec", help="JSON or CSV annotation spec")
+    apply.add_argument("paths", nargs="+", help="PDF files or folders")
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec) if args.command == 'apply' else None
+    jobs = [(path, entries_for(spec, path) if spec is not None else None) for path in iter_pdfs(args.paths, args.recursive)]
+    if spec is not None: jobs = [job for job in jobs if job[1]]
+
+    started, failed = time.perf_counter(), 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run_job, args.command, path, entries) for path, entries in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            failed += 'error' in result
+            print(json.dumps(result), flush=True)
+    print(f"{len(jobs)} files in {time.perf_counter() - started:.2f} s, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,468 @@
+"""The GUI-free part of the PDF annotator: reading, writing and exchanging annotations, and the folder and text indexes.
+
+Nothing here imports tkinter, so it can be used from the batch CLI (pdf_batch.py) and from worker processes.
+"""
+import bisect
+import importlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import string
+import tempfile
+import time
+import zlib
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access, so startup only pays for what it uses.
+
+    With optional=True a missing module is not an error: the proxy is then falsy and attribute access raises ImportError.
+    """
+    def __init__(self, name, optional=False):
+        self._name, self._optional, self._module = name, optional, None
+
+    def _load(self):
+        if self._module is None:
+            try: self._module = importlib.import_module(self._name)
+            except ImportError:
+                if not self._optional: raise
+                self._module = False
+        return self._module
+
+    def __getattr__(self, attr):
+        module = self._load()
+        if module is False: raise ImportError(f"{self._name} is not installed")
+        return getattr(module, attr)
+
+    def __bool__(self): return self._load() is not False
+
+fitz = LazyModule("fitz")  # PyMuPDF
+
+# --- Annotations ---
+# PDF annotation types this app reads and edits (fitz.PDF_ANNOT_TEXT, _FREE_TEXT and _HIGHLIGHT); everything else
+# on a page is left untouched. They are spelled out so importing this module does not load PyMuPDF.
+EDITABLE_TEXT_ANNOTS = (0, 2)
+EDITABLE_ANNOTS = EDITABLE_TEXT_ANNOTS + (8,)
+
+def read_page_annots(page):
+    """Parses the highlight and text annotations of a page into the in-memory annotation format.
+
+    Highlights are {'type': 'highlight', 'quads', 'color', 'rect', 'xref'} and text notes are
+    {'type': 'text', 'rect', 'text', 'color', 'xref'}, with colors as RGB tuples in 0..1.
+    """
+    page_annots = []
+    for annot in page.annots():
+        if annot.type[0] == 8: # Highlight
+            color = annot.colors.get("stroke", (1,1,0)) or (1,1,0)
+            quads = []
+            try: quads = annot.quads()
+            except AttributeError:
+                vertices = annot.vertices
+                if vertices and len(vertices) % 4 == 0:
+                    for i in range(0, len(vertices), 4):
+                        quads.append(fitz.Quad(vertices[i], vertices[i+1], vertices[i+2], vertices[i+3]))
+            if quads:
+                bounding_rect = fitz.Rect()
+                for q in quads: bounding_rect.include_rect(q.rect)
+                page_annots.append({'type': 'highlight', 'quads': quads, 'color': color, 'rect': bounding_rect, 'xref': annot.xref})
+        elif annot.type[0] in EDITABLE_TEXT_ANNOTS: # Text, or FreeText as written by write_page_annots
+            if annot.type[0] == 2: color = da_text_color(page.parent.xref_get_key(annot.xref, "DA")[1])
+            else: color = annot.colors.get('fill', (0,0,0)) or (0,0,0)
+            page_annots.append({'type': 'text', 'rect': annot.rect, 'text': annot.info.get('content', ''), 'color': color, 'xref': annot.xref})
+    return page_annots
+
+def da_text_color(da):
+    """Returns the text color set by a default appearance string such as "1 0 0 rg /Helv 11 Tf", black if it sets none."""
+    tokens = da.split()
+    for i, op in enumerate(tokens):
+        try:
+            if op == 'rg' and i >= 3: return tuple(float(t) for t in tokens[i - 3:i])
+            if op == 'g' and i >= 1: return (float(tokens[i - 1]),) * 3
+            if op == 'k' and i >= 4:
+                c, m, y, k = (float(t) for t in tokens[i - 4:i])
+                return ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+        except ValueError: break
+    return (0, 0, 0)
+
+def write_page_annots(page, page_annots):
+    """Brings the annotations of a page in line with an annotation list, touching only the ones that changed.
+
+    Annotations read from the file carry their 'xref'; file annotations whose xref is no longer listed are
+    deleted and list entries without one are added. Returns (annot_data, xref) for every added annotation.
+    """
+    kept = {a['xref'] for a in page_annots if a.get('xref')}
+    for annot in list(page.annots(types=EDITABLE_ANNOTS)):
+        if annot.xref not in kept: page.delete_annot(annot)
+
+    added = []
+    for annot_data in page_annots:
+        if annot_data.get('xref'): continue
+        if annot_data['type'] == 'highlight':
+            annot = page.add_highlight_annot(annot_data['quads'])
+            annot.set_colors(stroke=annot_data['color']); annot.update()
+        elif annot_data['type'] == 'text':
+            annot = page.add_freetext_annot(annot_data['rect'], annot_data['text'], fontname="helv", fontsize=11, text_color=annot_data['color'])
+        added.append((annot_data, annot.xref))
+    return added
+
+def write_annots(path, snapshot, progress=None):
+    """Writes {page_num: annotation list} into a PDF as an incremental update. Returns the added annotations' xrefs."""
+    doc = fitz.open(path)
+    added = []
+    try:
+        for done, (page_num, page_annots) in enumerate(sorted(snapshot.items()), 1):
+            added += write_page_annots(doc.load_page(page_num), page_annots)
+            if progress: progress(done, len(snapshot))
+        doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    finally: doc.close()
+    return added
+
+# Prefix of the temporary copies written by write_annots_copy; they are never listed.
+SAVE_TEMP_PREFIX = ".saving-"
+
+def is_listed_pdf(name): return name.lower().endswith(".pdf") and not name.startswith(SAVE_TEMP_PREFIX)
+
+def write_annots_copy(path, snapshot, progress=None):
+    """Like write_annots, but writes into a copy next to the file, for the caller to swap in with os.replace.
+
+    Returns the copy's path and the added annotations' xrefs. The copy is removed if writing it fails.
+    """
+    fd, temp_path = tempfile.mkstemp(prefix=SAVE_TEMP_PREFIX, suffix=".pdf", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        shutil.copyfile(path, temp_path); shutil.copymode(path, temp_path)
+        return temp_path, write_annots(temp_path, snapshot, progress)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def save_annots_atomically(path, snapshot, progress=None):
+    """Like write_annots, but writes into a copy next to the file and swaps it in, so an interrupted save leaves the original intact."""
+    temp_path, added = write_annots_copy(path, snapshot, progress)
+    try: os.replace(temp_path, path)
+    except PermissionError:
+        # Windows cannot replace a file that another program has open.
+        added = write_annots(path, snapshot)
+    finally:
+        if os.path.exists(temp_path): os.remove(temp_path)
+    return added
+
+def make_highlight(quads, color):
+    rect = fitz.Rect()
+    for q in quads: rect.include_rect(q.rect)
+    return {'type': 'highlight', 'quads': quads, 'color': tuple(color), 'rect': rect}
+
+def annot_to_json(page_num, annot):
+    """Converts an in-memory annotation to a JSON-ready dict. Pages are numbered from 1, quads are flat lists of their 8 corner coordinates."""
+    entry = {'page': page_num + 1, 'type': annot['type'], 'color': list(annot['color']), 'rect': list(annot['rect'])}
+    if annot['type'] == 'highlight': entry['quads'] = [[c for point in (q.ul, q.ur, q.ll, q.lr) for c in point] for q in annot['quads']]
+    else: entry['text'] = annot['text']
+    return entry
+
+def annot_from_json(entry):
+    """Builds an in-memory annotation from a dict in the annot_to_json format. A highlight may give a 'rect' instead of 'quads'."""
+    if entry['type'] == 'highlight':
+        if entry.get('quads'): quads = [fitz.Quad(*(fitz.Point(q[i], q[i + 1]) for i in range(0, 8, 2))) for q in entry['quads']]
+        else: quads = [fitz.Rect(entry['rect']).quad]
+        return make_highlight(quads, entry.get('color') or (1, 1, 0))
+    if entry['type'] == 'text': return {'type': 'text', 'rect': fitz.Rect(entry['rect']), 'text': entry.get('text', ''), 'color': tuple(entry.get('color') or (0, 0, 0))}
+    raise ValueError(f"Unknown annotation type {entry['type']!r}")
+
+def export_annots(path):
+    """Returns every highlight and text annotation of a PDF in the annot_to_json format."""
+    with fitz.open(path) as doc:
+        return [annot_to_json(page_num, annot) for page_num, page in enumerate(doc) for annot in read_page_annots(page)]
+
+def apply_annots(path, entries):
+    """Adds the annotations described by entries to a PDF and saves it atomically. Returns how many were added.
+
+    Entries are in the annot_to_json format, except that an entry without 'page' applies to every page and a
+    highlight may give a 'search' string instead of coordinates, which highlights each occurrence of it.
+    """
+    snapshot, added = {}, 0
+    with fitz.open(path) as doc:
+        for entry in entries:
+            page_nums = [int(entry['page']) - 1] if entry.get('page') else range(len(doc))
+            for page_num in page_nums:
+                if not 0 <= page_num < len(doc): raise ValueError(f"Page {page_num + 1} is out of range")
+                page = doc.load_page(page_num)
+                if entry.get('search'):
+                    new = [make_highlight([q], entry.get('color') or (1, 1, 0)) for q in page.search_for(entry['search'], quads=True)]
+                else: new = [annot_from_json(entry)]
+                if new: snapshot.setdefault(page_num, read_page_annots(page)).extend(new)
+                added += len(new)
+    if snapshot: save_annots_atomically(path, snapshot)
+    return added
+
+# --- Page Rendering ---
+# The document a render worker process has open, as (path, mtime), and its handle.
+_render_key, _render_doc = None, None
+
+def render_document(path, mtime):
+    """Returns the document a render worker process renders from, kept open between calls, or None if the
+    file is no longer the version last modified at mtime."""
+    global _render_key, _render_doc
+    if _render_key != (path, mtime):
+        release_render_document()
+        if os.path.getmtime(path) != mtime: return None
+        _render_key, _render_doc = (path, mtime), fitz.open(path)
+    return _render_doc
+
+def render_page_samples(path, mtime, page_num, zoom):
+    """Rasterizes a page in a render worker process.
+
+    Returns (width, height, writable RGB samples, milliseconds the rasterizing took), or None if the file changed.
+    """
+    doc = render_document(path, mtime)
+    if doc is None: return None
+    page = doc.load_page(page_num)
+    start = time.perf_counter()
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return pix.width, pix.height, bytearray(pix.samples_mv), (time.perf_counter() - start) * 1000
+
+def release_render_document():
+    """Closes the document of a render worker process, so the file can be renamed or replaced."""
+    global _render_key, _render_doc
+    if _render_doc: _render_doc.close()
+    _render_key, _render_doc = None, None
+
+# --- Folder Index ---
+THUMBNAIL_SIZE = 128
+
+def read_pdf_info(path):
+    """Returns the page count, title and a PNG first-page thumbnail of a PDF. Runs in the index worker processes."""
+    try:
+        with fitz.open(path) as doc:
+            title = (doc.metadata or {}).get('title') or ''
+            thumbnail = b''
+            if len(doc):
+                page = doc.load_page(0)
+                zoom = THUMBNAIL_SIZE / max(page.rect.width, page.rect.height)
+                thumbnail = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("png")
+            return len(doc), title, thumbnail
+    except Exception: return 0, '', b'' # Unreadable files are indexed as empty so they are not retried until they change.
+
+def list_pdfs(folder):
+    """Returns {name: (size, mtime)} of the PDFs in a folder, with os.scandir."""
+    listing = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not is_listed_pdf(entry.name) or not entry.is_file(): continue
+            stat = entry.stat()
+            listing[entry.name] = (stat.st_size, stat.st_mtime)
+    return listing
+
+class FolderIndex:
+    """A persistent SQLite cache of PDF metadata per folder, validated against each file's size and mtime."""
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS files (folder TEXT, name TEXT, size INTEGER, mtime REAL, "
+                        "pages INTEGER, title TEXT, thumbnail BLOB, PRIMARY KEY (folder, name))")
+
+    def scan(self, folder):
+        """Lists the PDFs in a folder with os.scandir. Returns ({name: info}, stale) where stale lists the
+        (name, size, mtime) of files that are new or changed since they were indexed; their info is None."""
+        return self.update(folder, list_pdfs(folder))
+
+    def cached(self, folder):
+        """Returns {name: info} of a folder as it was last indexed, without looking at the disk."""
+        return {row[0]: {'pages': row[3], 'title': row[4], 'size': row[1], 'mtime': row[2]}
+                for row in self.db.execute("SELECT name, size, mtime, pages, title FROM files WHERE folder = ?", (folder,))}
+
+    def update(self, folder, listing):
+        """Like scan(), for a {name: (size, mtime)} listing from list_pdfs(), which may have been made on another thread."""
+        cached = {row[0]: row[1:] for row in self.db.execute("SELECT name, size, mtime, pages, title FROM files WHERE folder = ?", (folder,))}
+        files, stale = {}, []
+        for name, (size, mtime) in listing.items():
+            row = cached.pop(name, None)
+            if row and row[0] == size and row[1] == mtime: files[name] = {'pages': row[2], 'title': row[3], 'size': size, 'mtime': mtime}
+            else: files[name] = None; stale.append((name, size, mtime))
+        if cached:
+            self.db.executemany("DELETE FROM files WHERE folder = ? AND name = ?", [(folder, name) for name in cached])
+            self.db.commit()
+        return files, stale
+
+    def store(self, folder, name, size, mtime, pages, title, thumbnail):
+        """Records a file's metadata; call commit() to make it durable."""
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", (folder, name, size, mtime, pages, title, thumbnail))
+
+    def rename(self, folder, old_name, new_name):
+        """Carries a file's entry over a rename, which leaves its size and mtime unchanged."""
+        self.db.execute("DELETE FROM files WHERE folder = ? AND name = ?", (folder, new_name))
+        self.db.execute("UPDATE files SET name = ? WHERE folder = ? AND name = ?", (new_name, folder, old_name))
+        self.db.commit()
+
+    def thumbnail(self, folder, name):
+        row = self.db.execute("SELECT thumbnail FROM files WHERE folder = ? AND name = ?", (folder, name)).fetchone()
+        return row[0] if row and row[0] else None
+
+    def forget(self, folder, name): self.db.execute("DELETE FROM files WHERE folder = ? AND name = ?", (folder, name))
+
+    def commit(self): self.db.commit()
+
+# --- Page Thumbnails ---
+# Page thumbnails are rendered at a small fixed scale, reduced further for pages that would not fit the box.
+THUMB_ZOOM = 0.2
+THUMB_BOX = (120, 170)
+
+def thumbnail_zoom(page_rect): return min(THUMB_ZOOM, THUMB_BOX[0] / page_rect.width, THUMB_BOX[1] / page_rect.height)
+
+def render_thumbnail(path, mtime, page_num):
+    """Renders a page thumbnail as JPEG in a render worker process, or returns None if the file changed."""
+    doc = render_document(path, mtime)
+    if doc is None: return None
+    page = doc.load_page(page_num)
+    zoom = thumbnail_zoom(page.rect)
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("jpg", jpg_quality=70)
+
+class ThumbnailStore:
+    """Page thumbnails on disk as JPEG, valid for as long as their file keeps its size and mtime."""
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path, timeout=30)
+        self.db.execute("CREATE TABLE IF NOT EXISTS thumb_docs (path TEXT PRIMARY KEY, size INTEGER, mtime REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS thumb_pages (path TEXT, page INTEGER, jpeg BLOB, PRIMARY KEY (path, page))")
+
+    def validate(self, path, size, mtime):
+        """Discards the thumbnails stored for an older version of a file."""
+        if self.db.execute("SELECT size, mtime FROM thumb_docs WHERE path = ?", (path,)).fetchone() == (size, mtime): return
+        with self.db:
+            self.db.execute("DELETE FROM thumb_pages WHERE path = ?", (path,))
+            self.db.execute("INSERT OR REPLACE INTO thumb_docs VALUES (?, ?, ?)", (path, size, mtime))
+
+    def get(self, path, page_num):
+        row = self.db.execute("SELECT jpeg FROM thumb_pages WHERE path = ? AND page = ?", (path, page_num)).fetchone()
+        return row[0] if row else None
+
+    def put(self, path, page_num, jpeg):
+        """Stores a page's thumbnail in a transaction of its own, so other writers to the index file never wait for rendering."""
+        with self.db: self.db.execute("INSERT OR REPLACE INTO thumb_pages VALUES (?, ?, ?)", (path, page_num, jpeg))
+
+    def revalidate(self, path, old_stat, new_stat, pages):
+        """Keeps the stored thumbnails of a file's new version, except those of the given pages, e.g. after saving their annotations."""
+        with self.db:
+            if self.db.execute("UPDATE thumb_docs SET size = ?, mtime = ? WHERE path = ? AND size = ? AND mtime = ?", new_stat + (path,) + old_stat).rowcount:
+                self.db.executemany("DELETE FROM thumb_pages WHERE path = ? AND page = ?", [(path, p) for p in pages])
+
+# --- Text Search ---
+WORD_PUNCTUATION = string.punctuation + "\u201c\u201d\u2018\u2019\u00ab\u00bb\u2026"
+
+def normalize_word(word): return word.strip(WORD_PUNCTUATION).lower()
+
+class TextStore:
+    """Extracted page words on disk, valid for as long as their file keeps its size and mtime."""
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path, timeout=30)
+        self.db.execute("CREATE TABLE IF NOT EXISTS text_docs (path TEXT PRIMARY KEY, size INTEGER, mtime REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS text_pages (path TEXT, page INTEGER, words BLOB, PRIMARY KEY (path, page))")
+
+    def load(self, path, size, mtime):
+        """Returns {page_num: words} stored for this version of a file, discarding whatever was stored for an older one."""
+        if self.db.execute("SELECT size, mtime FROM text_docs WHERE path = ?", (path,)).fetchone() == (size, mtime):
+            return {page_num: [tuple(w) for w in json.loads(zlib.decompress(blob))]
+                    for page_num, blob in self.db.execute("SELECT page, words FROM text_pages WHERE path = ?", (path,))}
+        with self.db:
+            self.db.execute("DELETE FROM text_pages WHERE path = ?", (path,))
+            self.db.execute("INSERT OR REPLACE INTO text_docs VALUES (?, ?, ?)", (path, size, mtime))
+        return {}
+
+    def store(self, path, pages):
+        rows = [(path, page_num, zlib.compress(json.dumps([[round(c, 2) for c in w[:4]] + [w[4]] for w in words]).encode()))
+                for page_num, words in pages.items()]
+        with self.db: self.db.executemany("INSERT OR REPLACE INTO text_pages VALUES (?, ?, ?)", rows)
+
+    def revalidate(self, path, old_stat, new_stat):
+        """Keeps the stored words of a file whose new version has the same text, e.g. after saving annotations."""
+        with self.db: self.db.execute("UPDATE text_docs SET size = ?, mtime = ? WHERE path = ? AND size = ? AND mtime = ?", new_stat + (path,) + old_stat)
+
+class TextIndex:
+    """An inverted index from normalized words to their positions in a document's page word lists."""
+
+    def __init__(self):
+        self.pages = {}
+        self.postings = {}
+        self._terms = None
+
+    def add_page(self, page_num, words):
+        """Adds a page's words, as (x0, y0, x1, y1, text, ...) tuples in reading order."""
+        self.pages[page_num] = words
+        for i, word in enumerate(words):
+            term = normalize_word(word[4])
+            if term: self.postings.setdefault(term, []).append((page_num, i))
+        self._terms = None
+
+    def search(self, query):
+        """Returns (page_num, word_index, rect) of every occurrence of a phrase, in page order. Its last word may be a prefix."""
+        terms = [t for t in map(normalize_word, query.split()) if t]
+        if not terms: return []
+        if self._terms is None: self._terms = sorted(self.postings)
+        start = bisect.bisect_left(self._terms, terms[-1])
+        last = set(itertools.takewhile(lambda t: t.startswith(terms[-1]), itertools.islice(self._terms, start, None)))
+
+        hits = []
+        for first in (last if len(terms) == 1 else [terms[0]]):
+            for page_num, i in self.postings.get(first, ()):
+                words = self.pages[page_num]
+                if i + len(terms) > len(words): continue
+                following = [normalize_word(w[4]) for w in words[i + 1:i + len(terms)]]
+                if following[:-1] != terms[1:-1] or (following and following[-1] not in last): continue
+                rect = fitz.Rect(words[i][:4])
+                for word in words[i + 1:i + len(terms)]: rect |= word[:4]
+                hits.append((page_num, i, rect))
+        hits.sort(key=lambda hit: hit[:2])
+        return hits
+
+# --- Library Search ---
+def extract_pdf_words(path):
+    """Returns {page_num: [(x0, y0, x1, y1, text), ...]} for every page of a PDF. Runs in the library indexer's worker processes."""
+    try:
+        with fitz.open(path) as doc: return {i: [w[:5] for w in page.get_text("words")] for i, page in enumerate(doc)}
+    except Exception: return {} # Unreadable files are indexed as empty so they are not retried until they change.
+
+def fts_query(query):
+    """Turns user input into an FTS5 query matching all its words, the last one as a prefix."""
+    terms = ['"%s"' % t.replace('"', '""') for t in query.split()]
+    if terms: terms[-1] += "*"
+    return " ".join(terms)
+
+class LibrarySearch:
+    """Full-text search over the pages of every PDF in a folder, using an SQLite FTS5 table ranked by bm25."""
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path, timeout=30)
+        # WAL lets searches read while the indexer writes.
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS library_docs (path TEXT PRIMARY KEY, folder TEXT, size INTEGER, mtime REAL, pages INTEGER)")
+        self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS library_pages USING fts5(text, path UNINDEXED, page UNINDEXED)")
+
+    def indexed(self, folder):
+        return {path: (size, mtime) for path, size, mtime in self.db.execute("SELECT path, size, mtime FROM library_docs WHERE folder = ?", (folder,))}
+
+    def replace(self, folder, path, size, mtime, pages):
+        """Replaces the indexed text of a file with {page_num: words}."""
+        with self.db:
+            self.db.execute("DELETE FROM library_pages WHERE path = ?", (path,))
+            self.db.executemany("INSERT INTO library_pages VALUES (?, ?, ?)", [(" ".join(w[4] for w in words), path, page_num) for page_num, words in pages.items()])
+            self.db.execute("INSERT OR REPLACE INTO library_docs VALUES (?, ?, ?, ?, ?)", (path, folder, size, mtime, len(pages)))
+
+    def remove(self, paths):
+        with self.db:
+            for path in paths:
+                self.db.execute("DELETE FROM library_pages WHERE path = ?", (path,))
+                self.db.execute("DELETE FROM library_docs WHERE path = ?", (path,))
+
+    def search(self, folder, query, limit=100):
+        """Returns [(path, best_page, snippet, matching_pages)] for the best-ranked files in a folder."""
+        match = fts_query(query)
+        if not match: return []
+        results = {}
+        rows = self.db.execute("SELECT path, page, snippet(library_pages, 0, '[', ']', '...', 10) FROM library_pages "
+                               "WHERE library_pages MATCH ? AND path IN (SELECT path FROM library_docs WHERE folder = ?) ORDER BY bm25(library_pages)",
+                               (match, folder))
+        for path, page_num, snippet in rows:
+            if path in results: results[path][3] += 1
+            elif len(results) < limit: results[path] = [path, page_num, snippet, 1]
+        return [tuple(r) for r in results.values()]
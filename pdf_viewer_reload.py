@@ -1,10 +1,614 @@
+import time
+START_TIME = time.perf_counter() # Before the other imports, so time to interactive includes them.
 import tkinter as tk
-from tkinter import filedialog, ttk, simpledialog, messagebox
+from tkinter import filedialog, ttk, simpledialog, messagebox, font as tkfont
 from tkinter.colorchooser import askcolor
-import fitz  # PyMuPDF
-from PIL import Image, ImageTk, ImageDraw, ImageFont
 import os
-import copy
+import atexit
+import bisect
+import cProfile
+import ctypes
+import ctypes.util
+import io
+import itertools
+import json
+import multiprocessing
+import select
+import struct
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from pdf_core import (THUMB_BOX, FolderIndex, LazyModule, LibrarySearch, TextIndex, TextStore, ThumbnailStore,
+                      extract_pdf_words, is_listed_pdf, list_pdfs, read_page_annots, read_pdf_info, release_render_document,
+                      render_page_samples, render_thumbnail, thumbnail_zoom, write_annots_copy)
+
+# PyMuPDF, PIL and NumPy take most of the import time, so they are loaded when first used rather than before the window shows.
+fitz = LazyModule("fitz")  # PyMuPDF
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+ImageFont = LazyModule("PIL.ImageFont")
+ImageTk = LazyModule("PIL.ImageTk")
+np = LazyModule("numpy", optional=True) # Without it, highlights are composited with PIL over the whole page.
+
+def page_width(page):
+    """Returns the width of a page as laid out for "Page Width", its height if it is rotated sideways."""
+    return page.rect.height if page.rotation in [90, 270] else page.rect.width
+
+def page_zoom(width, zoom_mode, canvas_width):
+    """Returns the render scale of a page of this width for a zoom menu setting such as "Page Width" or "150%"."""
+    if zoom_mode == "Page Width": return canvas_width / width
+    else: return int(zoom_mode.replace('%','')) / 100.0
+
+def raster_from_samples(width, height, samples):
+    """Wraps writable RGB pixmap samples as a base raster: a NumPy array when available, else a PIL image."""
+    if not np: return Image.frombytes("RGB", (width, height), samples)
+    return np.frombuffer(samples, dtype=np.uint8).reshape(height, width, 3)
+
+def load_annot_font(zoom):
+    # Previews and thumbnails of large pages are drawn at zooms where an 11 pt note rounds to nothing.
+    try: return ImageFont.truetype("Arial.ttf", size=max(1, int(11 * zoom)))
+    except IOError: return ImageFont.load_default()
+
+@contextmanager
+def annotated_image(base, page_annots, zoom, origin=(0, 0)):
+    """Yields a PIL image of a base raster with the given annotations drawn over it.
+
+    origin is the position of the raster's top-left pixel on the zoomed page, for rasters of a single tile.
+    With NumPy the annotations are blended into the base array in place, touching only the pixels
+    under each highlight quad or text box, and those pixels are restored on exit. PIL keeps RGB pixels
+    in its own 4-byte layout, so the yielded image is always a copy of the raster and stays valid after the block.
+    """
+    if not np:
+        yield composite_annotations_pil(base, page_annots, zoom, origin)
+        return
+
+    height, width = base.shape[:2]
+    mat = fitz.Matrix(zoom, 0, 0, zoom, -origin[0], -origin[1])
+    font, measure = None, None
+    strokes, saved = [], []
+    for annot in page_annots:
+        color = np.array([int(c * 255) for c in annot['color'][:3]], dtype=np.uint16)
+        if annot['type'] == 'highlight':
+            for quad in annot['quads']:
+                q = quad * mat
+                # PIL fills the far edge of a slanted polygon too, so give those boxes an extra pixel.
+                aligned = abs(q.ul.y - q.ur.y) < 0.5 and abs(q.ul.x - q.ll.x) < 0.5
+                box = (q.rect if aligned else q.rect + (0, 0, 1, 1)).round() & (0, 0, width, height)
+                if box.is_empty: continue
+                strokes.append(('quad' if aligned else 'polygon', box, color, q))
+        elif annot['type'] == 'text':
+            if font is None: font, measure = load_annot_font(zoom), ImageDraw.Draw(Image.new("RGB", (1, 1)))
+            rect = annot['rect'] * mat
+            bbox = measure.multiline_textbbox((rect.x0, rect.y0), annot['text'], font=font)
+            box = fitz.Rect(bbox).round() & (0, 0, width, height)
+            if box.is_empty: continue
+            strokes.append(('text', box, color, (rect.x0 - box.x0, rect.y0 - box.y0, annot['text'])))
+    # Keep the original pixels of every touched box: each highlight blends over the original, so the last
+    # one painted wins where highlights overlap, just like drawing them all on one overlay.
+    for _, box, _, _ in strokes: saved.append((box, base[box.y0:box.y1, box.x0:box.x1].copy()))
+
+    try:
+        for (kind, box, color, shape), (_, original) in zip(strokes, saved):
+            region = base[box.y0:box.y1, box.x0:box.x1]
+            if kind != 'text':
+                blended = ((original.astype(np.uint16) * 127 + color * 128 + 127) // 255).astype(np.uint8)
+                if kind == 'quad': region[:] = blended
+                else:
+                    mask = Image.new("L", (box.width, box.height), 0)
+                    ImageDraw.Draw(mask).polygon([(p.x - box.x0, p.y - box.y0) for p in (shape.ul, shape.ur, shape.lr, shape.ll)], fill=255)
+                    covered = np.asarray(mask, dtype=bool)
+                    region[covered] = blended[covered]
+            else:
+                x, y, text = shape
+                patch = Image.fromarray(region.copy())
+                ImageDraw.Draw(patch).multiline_text((x, y), text, fill=tuple(int(c) for c in color), font=font)
+                region[:] = np.asarray(patch)
+        yield Image.fromarray(base)
+    finally:
+        for box, original in reversed(saved): base[box.y0:box.y1, box.x0:box.x1] = original
+
+def composite_annotations_pil(base_image, page_annots, zoom, origin=(0, 0)):
+    """Draws annotations over a base raster with a full-page PIL overlay, for when NumPy is missing."""
+    mat = fitz.Matrix(zoom, 0, 0, zoom, -origin[0], -origin[1])
+    overlay = Image.new("RGBA", base_image.size, (255, 255, 255, 0))
+    draw = ImageDraw.Draw(overlay)
+    
+    for annot in page_annots:
+        color_rgb = annot['color']
+        color_int = (int(color_rgb[0]*255), int(color_rgb[1]*255), int(color_rgb[2]*255))
+        if annot['type'] == 'highlight':
+            color_rgba = color_int + (128,)
+            for quad in annot['quads']:
+                points_objects = [quad.ul * mat, quad.ur * mat, quad.lr * mat, quad.ll * mat]
+                flat_points = [(p.x, p.y) for p in points_objects]
+                draw.polygon(flat_points, fill=color_rgba)
+        elif annot['type'] == 'text':
+            rect = annot['rect'] * mat
+            draw.multiline_text((rect.x0, rect.y0), annot['text'], fill=color_int, font=load_annot_font(zoom))
+
+    return Image.alpha_composite(base_image.convert("RGBA"), overlay)
+
+class TextIndexBuilder:
+    """Fills a TextIndex from a background thread: from the TextStore when the file is unchanged, otherwise
+    by extracting the missing pages, which are stored as they are extracted so an interrupted build resumes.
+    """
+    BATCH_PAGES = 20
+
+    def __init__(self, root, db_path, path, on_pages):
+        self.root = root
+        self._cancelled = threading.Event()
+        threading.Thread(target=self._run, args=(db_path, path, on_pages), daemon=True, name="text-index").start()
+
+    def cancel(self): self._cancelled.set()
+
+    def _run(self, db_path, path, on_pages):
+        try:
+            stat = os.stat(path)
+            store = TextStore(db_path)
+            pages = store.load(path, stat.st_size, stat.st_mtime)
+            with fitz.open(path) as doc:
+                page_count = len(doc)
+                # Stored pages are handed over in batches too, so indexing them never blocks the Tk thread for long.
+                stored = sorted(pages)
+                for i in range(0, len(stored) or 1, self.BATCH_PAGES):
+                    self.root.after(0, on_pages, self, {p: pages[p] for p in stored[i:i + self.BATCH_PAGES]}, page_count)
+                batch = {}
+                for page_num in range(page_count):
+                    if self._cancelled.is_set(): return
+                    if page_num in pages: continue
+                    batch[page_num] = [w[:5] for w in doc.load_page(page_num).get_text("words")]
+                    if len(batch) == self.BATCH_PAGES or page_num == page_count - 1:
+                        store.store(path, batch)
+                        self.root.after(0, on_pages, self, batch, page_count)
+                        batch = {}
+        except (RuntimeError, tk.TclError): pass # The window was closed.
+        except Exception as e: print(f"Could not index text of {path}: {e}")
+
+class ThumbnailRenderer:
+    """Renders the page thumbnails of one document through the on-disk ThumbnailStore, on a background thread
+    that has them rendered in a worker process of `pool`, since PyMuPDF holds the GIL while rendering.
+
+    Pages are taken in the order of the latest prioritize() call, so the ones in view come first, and each
+    is handed to on_thumbnail(renderer, page_num, jpeg) once; pages in `done` are skipped.
+    """
+    def __init__(self, root, pool, db_path, path, on_thumbnail, done=()):
+        self.root = root
+        self.pool = pool
+        self._order = []
+        self._pos = 0
+        self._done = set(done)
+        self._cancelled = False
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, args=(db_path, path, on_thumbnail), daemon=True, name="thumbnails").start()
+
+    def prioritize(self, pages):
+        with self._cond:
+            self._order, self._pos = pages, 0
+            self._cond.notify()
+
+    def cancel(self):
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify()
+
+    def _next(self):
+        """Waits for the next page to render; returns None once cancelled."""
+        with self._cond:
+            while not self._cancelled:
+                while self._pos < len(self._order) and self._order[self._pos] in self._done: self._pos += 1
+                if self._pos < len(self._order):
+                    page_num = self._order[self._pos]
+                    self._done.add(page_num)
+                    return page_num
+                self._cond.wait()
+            return None
+
+    def _run(self, db_path, path, on_thumbnail):
+        try:
+            stat = os.stat(path)
+            store = ThumbnailStore(db_path)
+            store.validate(path, stat.st_size, stat.st_mtime)
+            while not self._cancelled:
+                page_num = self._next()
+                if page_num is None: continue
+                jpeg = store.get(path, page_num)
+                if jpeg is None:
+                    jpeg = self.pool.submit(render_thumbnail, path, stat.st_mtime, page_num).result()
+                    # The file may have been saved meanwhile.
+                    if jpeg is None or self._cancelled: break
+                    store.put(path, page_num, jpeg)
+                self.root.after(0, on_thumbnail, self, page_num, jpeg)
+        except (RuntimeError, tk.TclError): pass # The window was closed.
+        except Exception as e: print(f"Could not render thumbnails of {path}: {e}")
+
+class LibraryIndexer:
+    """Brings the LibrarySearch entries of a folder up to date from a background thread.
+
+    Only files that are new or whose size or mtime changed are read, by a process pool so text is extracted on all
+    cores. Their words also go into the TextStore, so Find is immediate when such a file is opened.
+    """
+
+    def __init__(self, root, db_path, folder, on_progress, workers=None):
+        self.root = root
+        self.folder = folder
+        self.workers = workers or os.cpu_count() or 1
+        self._cancelled = threading.Event()
+        self.done = False
+        threading.Thread(target=self._run, args=(db_path, on_progress), daemon=True, name="library-index").start()
+
+    def cancel(self): self._cancelled.set()
+
+    def _run(self, db_path, on_progress):
+        try:
+            library, text_store = LibrarySearch(db_path), TextStore(db_path)
+            with os.scandir(self.folder) as entries:
+                listing = {e.path: (e.stat().st_size, e.stat().st_mtime) for e in entries if is_listed_pdf(e.name) and e.is_file()}
+            indexed = library.indexed(self.folder)
+            library.remove([path for path in indexed if path not in listing])
+            stale = deque(sorted(path for path, stat in listing.items() if indexed.get(path) != stat))
+
+            files_done = pages_done = 0
+            started = time.perf_counter()
+            self.root.after(0, on_progress, self, files_done, len(stale), pages_done, 0.0)
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                running = {}
+                while (stale or running) and not self._cancelled.is_set():
+                    while stale and len(running) < 2 * self.workers:
+                        path = stale.popleft()
+                        running[pool.submit(extract_pdf_words, path)] = path
+                    finished, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        path = running.pop(future)
+                        pages = future.result()
+                        size, mtime = listing[path]
+                        library.replace(self.folder, path, size, mtime, pages)
+                        if pages: text_store.load(path, size, mtime); text_store.store(path, pages)
+                        files_done += 1; pages_done += len(pages)
+                    if finished:
+                        self.root.after(0, on_progress, self, files_done, files_done + len(stale) + len(running), pages_done, time.perf_counter() - started)
+                if self._cancelled.is_set(): pool.shutdown(cancel_futures=True)
+            self.done = True
+            self.root.after(0, on_progress, self, files_done, files_done, pages_done, time.perf_counter() - started)
+        except (RuntimeError, tk.TclError): pass # The window was closed.
+        except Exception as e: print(f"Could not index {self.folder}: {e}")
+
+class LibrarySearchWindow:
+    """A window for searching the text of every PDF in the current folder; activating a result opens it at the page."""
+
+    def __init__(self, app):
+        self.app = app
+        self.indexer = None
+        self.results = []
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Search Folder")
+        self.window.geometry("700x450")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        bar = tk.Frame(self.window)
+        bar.pack(fill=tk.X, padx=10, pady=10)
+        self.query_var = tk.StringVar()
+        entry = ttk.Entry(bar, textvariable=self.query_var)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        entry.bind("<Return>", lambda e: self.search())
+        ttk.Button(bar, text="Search", command=self.search).pack(side=tk.LEFT, padx=(5, 0))
+        self.status = tk.Label(self.window, text="", anchor=tk.W)
+        self.status.pack(fill=tk.X, padx=10)
+
+        self.result_list = tk.Listbox(self.window, font=("Arial", 10), activestyle=tk.NONE)
+        self.result_list.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.result_list.bind("<Double-Button-1>", lambda e: self.open_result())
+        self.result_list.bind("<Return>", lambda e: self.open_result())
+        entry.focus_set()
+        self.update_index()
+
+    def update_index(self):
+        """Starts an incremental index pass over the current folder unless one was already started for it."""
+        if self.indexer and self.indexer.folder == self.app.current_folder: return
+        if self.indexer: self.indexer.cancel()
+        self.indexer = LibraryIndexer(self.app.root, self.app.index_db_path, self.app.current_folder, self.on_progress)
+
+    def on_progress(self, indexer, files_done, files_total, pages_done, elapsed):
+        if indexer is not self.indexer: return
+        rate = f", {pages_done / elapsed:.0f} pages/s" if elapsed > 0 and pages_done else ""
+        if indexer.done: self.status.config(text=f"Index up to date: read {files_done} changed files, {pages_done} pages in {elapsed:.1f} s{rate}")
+        else: self.status.config(text=f"Indexing {files_done} of {files_total} changed files, {pages_done} pages{rate}")
+        # Results improve as the index fills, so refresh them while a query is entered.
+        if self.query_var.get().strip() and (indexer.done or files_done % 20 == 0): self.run_query()
+
+    def search(self):
+        if not self.app.current_folder: return
+        self.update_index()
+        self.run_query()
+
+    def run_query(self):
+        """Shows the matches of the entered query in what is indexed so far."""
+        self.results = self.app.library_search.search(self.app.current_folder, self.query_var.get())
+        self.result_list.delete(0, tk.END)
+        for path, page_num, snippet, matching_pages in self.results:
+            self.result_list.insert(tk.END, f"{os.path.basename(path)}  p. {page_num + 1}  ({matching_pages} pages): {snippet}")
+        if not self.results: self.result_list.insert(tk.END, "No matches" if self.query_var.get().strip() else "")
+
+    def open_result(self):
+        selection = self.result_list.curselection()
+        if not selection or selection[0] >= len(self.results): return
+        path, page_num, _, _ = self.results[selection[0]]
+        self.app.open_file_at(os.path.basename(path), page_num, find=self.query_var.get())
+
+    def close(self):
+        if self.indexer: self.indexer.cancel()
+        self.app.library_window = None
+        self.window.destroy()
+
+# inotify(7) events that can add, remove or change a file in the watched folder.
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x8, 0x40, 0x80, 0x100, 0x200
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+class FolderWatcher:
+    """Reports the names of PDFs that appear, disappear or change in a folder, from a background thread.
+
+    Uses inotify on Linux and otherwise compares os.scandir listings every POLL_INTERVAL seconds. Bursts of
+    events are collected until the folder has been quiet for DEBOUNCE seconds and delivered as one set.
+    """
+    DEBOUNCE = 0.5
+    POLL_INTERVAL = 2.0
+
+    def __init__(self, root, folder, on_changes):
+        self.root = root
+        self.folder = folder
+        self.on_changes = on_changes
+        self._stop = threading.Event()
+        self._inotify_fd = self._open_inotify(folder)
+        threading.Thread(target=self._run, daemon=True, name="folder-watch").start()
+
+    @property
+    def uses_inotify(self): return self._inotify_fd is not None
+
+    def stop(self): self._stop.set()
+
+    @staticmethod
+    def _open_inotify(folder):
+        if not sys.platform.startswith("linux"): return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0: return None
+            if libc.inotify_add_watch(fd, os.fsencode(folder), INOTIFY_MASK) < 0: os.close(fd); return None
+            return fd
+        except (OSError, AttributeError): return None
+
+    def _read_events(self):
+        data, names, offset = os.read(self._inotify_fd, 65536), set(), 0
+        while offset < len(data):
+            _, _, _, length = struct.unpack_from("iIII", data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+            if is_listed_pdf(name): names.add(name)
+            offset += 16 + length
+        return names
+
+    def _listing(self):
+        try:
+            with os.scandir(self.folder) as entries:
+                return {e.name: (e.stat().st_size, e.stat().st_mtime) for e in entries if is_listed_pdf(e.name)}
+        except OSError: return {}
+
+    def _run(self):
+        pending, quiet_at = set(), 0
+        listing = None if self.uses_inotify else self._listing()
+        try:
+            while not self._stop.is_set():
+                if self.uses_inotify:
+                    if select.select([self._inotify_fd], [], [], self.DEBOUNCE)[0]:
+                        pending |= self._read_events()
+                        quiet_at = time.monotonic() + self.DEBOUNCE
+                else:
+                    self._stop.wait(self.POLL_INTERVAL)
+                    new_listing = self._listing()
+                    pending |= {name for name in listing.keys() | new_listing.keys() if listing.get(name) != new_listing.get(name)}
+                    listing = new_listing
+                if pending and time.monotonic() >= quiet_at and not self._stop.is_set():
+                    self.root.after(0, self.on_changes, self.folder, pending)
+                    pending = set()
+        except RuntimeError: pass # The window was closed.
+        finally:
+            if self.uses_inotify: os.close(self._inotify_fd)
+
+# --- File List ---
+class VirtualListbox:
+    """A single-selection list that draws only the rows in view, asking label_for(index) for each one.
+
+    Nothing is stored per row, so a folder of any size costs the same to show, and changing one row only
+    redraws what is visible. It offers the subset of the tk.Listbox interface the viewer uses.
+    """
+    SELECTED_BG = "#0078d7"
+
+    def __init__(self, master, label_for, font=("Arial", 11)):
+        self.label_for = label_for
+        self.count = 0
+        self.top = 0
+        self.selected = None
+        self.active = 0
+        self.font = tkfont.Font(font=font)
+        self.row_height = self.font.metrics("linespace") + 4
+        self.frame = tk.Frame(master)
+        self.canvas = tk.Canvas(self.frame, bg="white", highlightthickness=0, takefocus=1)
+        self.v_scroll = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.yview)
+        self.v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # Canvas items are recycled for whichever rows are in view.
+        self.rows = []
+
+        self.canvas.bind("<Configure>", lambda e: self.scroll_to(self.top))
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll_to(self.top - 3 if e.delta > 0 else self.top + 3))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_to(self.top - 3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_to(self.top + 3))
+        for key in ("Up", "Down", "Prior", "Next", "Home", "End"): self.canvas.bind(f"<{key}>", self._on_key)
+
+    def pack(self, **kwargs): self.frame.pack(**kwargs)
+    def bind(self, sequence, func): self.canvas.bind(sequence, func)
+    def focus_set(self): self.canvas.focus_set()
+
+    def visible_rows(self): return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def set_count(self, count):
+        """Points the list at a new number of rows; labels are fetched again for the rows in view."""
+        self.count = count
+        if self.selected is not None and self.selected >= count: self.selected = None
+        self.active = min(self.active, max(0, count - 1))
+        self.scroll_to(self.top)
+
+    def redraw(self):
+        width, rows_in_view = self.canvas.winfo_width(), self.visible_rows() + 1
+        while len(self.rows) < rows_in_view:
+            self.rows.append((self.canvas.create_rectangle(0, 0, 0, 0, width=0), self.canvas.create_text(0, 0, anchor=tk.W, font=self.font)))
+        for slot, (rect, text) in enumerate(self.rows):
+            index, y = self.top + slot, slot * self.row_height
+            if slot >= rows_in_view or index >= self.count:
+                self.canvas.itemconfig(rect, state=tk.HIDDEN); self.canvas.itemconfig(text, state=tk.HIDDEN)
+                continue
+            selected = index == self.selected
+            self.canvas.coords(rect, 0, y, width, y + self.row_height)
+            self.canvas.itemconfig(rect, state=tk.NORMAL, fill=self.SELECTED_BG if selected else "white",
+                                   outline="gray", width=1 if index == self.active else 0, dash=(1, 1))
+            self.canvas.coords(text, 4, y + self.row_height / 2)
+            self.canvas.itemconfig(text, state=tk.NORMAL, text=self.label_for(index), fill="white" if selected else "black")
+        if self.count: self.v_scroll.set(self.top / self.count, min(1.0, (self.top + self.visible_rows()) / self.count))
+        else: self.v_scroll.set(0, 1)
+
+    def refresh_row(self, index):
+        if self.top <= index <= self.top + self.visible_rows(): self.redraw()
+
+    def yview(self, *args):
+        if args[0] == "moveto": self.scroll_to(int(float(args[1]) * self.count))
+        elif args[0] == "scroll": self.scroll_to(self.top + int(args[1]) * (self.visible_rows() if args[2] == "pages" else 1))
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, self.count - self.visible_rows()))
+        self.redraw()
+
+    def see(self, index):
+        if index < self.top: self.scroll_to(index)
+        elif index >= self.top + self.visible_rows(): self.scroll_to(index - self.visible_rows() + 1)
+
+    def nearest(self, y): return min(self.count - 1, self.top + max(0, int(y // self.row_height)))
+    def curselection(self): return () if self.selected is None else (self.selected,)
+    def selection_includes(self, index): return index == self.selected
+    def index(self, which): return self.active
+
+    def selection_set(self, index):
+        self.selected = self.active = index
+        self.redraw()
+
+    def selection_clear(self, first=0, last=None):
+        self.selected = None
+        self.redraw()
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        index = self.nearest(event.y)
+        if index < 0: return
+        self.selection_set(index)
+        self.canvas.event_generate("<<ListboxSelect>>")
+
+    def _on_key(self, event):
+        """Moves the active row like a tk.Listbox does; Return then opens it."""
+        if not self.count: return
+        moves = {"Up": self.active - 1, "Down": self.active + 1, "Prior": self.active - self.visible_rows(),
+                 "Next": self.active + self.visible_rows(), "Home": 0, "End": self.count - 1}
+        self.active = max(0, min(moves[event.keysym], self.count - 1))
+        self.see(self.active)
+        self.redraw()
+
+class ThumbnailStrip:
+    """A column of page thumbnails in fixed-size slots that draws only the ones in view, decoding image_data(page_num).
+
+    on_select(page_num) is called for a click, and on_view_change() whenever other pages come into view.
+    """
+    GAP = 6
+    LABEL_HEIGHT = 16
+    WIDTH = THUMB_BOX[0] + 2 * GAP
+    SLOT_HEIGHT = THUMB_BOX[1] + LABEL_HEIGHT + GAP
+    CURRENT_OUTLINE = "#0078d7"
+
+    def __init__(self, master, image_data, on_select, on_view_change):
+        self.image_data = image_data
+        self.on_select = on_select
+        self.on_view_change = on_view_change
+        self.count = 0
+        self.current = None
+        self.photos = {}
+        self._shown = range(0)
+        self.frame = tk.Frame(master, bg="gray")
+        self.canvas = tk.Canvas(self.frame, width=self.WIDTH, bg="gray", highlightthickness=0)
+        self.v_scroll = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.Y)
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+
+    def pack(self, **kwargs): self.frame.pack(**kwargs)
+    def pack_forget(self): self.frame.pack_forget()
+
+    def set_count(self, count):
+        """Points the strip at a document with this many pages, scrolled to the top and with no thumbnails decoded."""
+        self.count, self.current = count, None
+        self.photos.clear()
+        self.canvas.config(scrollregion=(0, 0, self.WIDTH, count * self.SLOT_HEIGHT), yscrollincrement=self.SLOT_HEIGHT // 2)
+        self.canvas.yview_moveto(0)
+        self.redraw()
+
+    def visible_pages(self):
+        top, bottom = self.canvas.canvasy(0), self.canvas.canvasy(self.canvas.winfo_height())
+        return range(max(0, int(top // self.SLOT_HEIGHT)), min(self.count, int(bottom // self.SLOT_HEIGHT) + 1))
+
+    def redraw(self):
+        self.canvas.delete("thumb")
+        visible = self.visible_pages()
+        self.photos = {p: photo for p, photo in self.photos.items() if p in visible}
+        box_w, box_h = THUMB_BOX
+        for page_num in visible:
+            top = page_num * self.SLOT_HEIGHT + self.GAP
+            photo = self.photos.get(page_num)
+            if photo is None:
+                data = self.image_data(page_num)
+                if data: photo = self.photos[page_num] = ImageTk.PhotoImage(data=data)
+            width, height = (photo.width(), photo.height()) if photo else (box_w, box_h)
+            x, y = self.GAP + (box_w - width) // 2, top + (box_h - height) // 2
+            if photo: self.canvas.create_image(x, y, anchor=tk.NW, image=photo, tags="thumb")
+            else: self.canvas.create_rectangle(x, y, x + width, y + height, fill="lightgray", outline="", tags="thumb")
+            if page_num == self.current:
+                self.canvas.create_rectangle(x - 3, y - 3, x + width + 3, y + height + 3, outline=self.CURRENT_OUTLINE, width=3, tags="thumb")
+            self.canvas.create_text(self.WIDTH // 2, top + box_h + self.LABEL_HEIGHT // 2, text=str(page_num + 1), fill="white", tags="thumb")
+        if visible != self._shown:
+            self._shown = visible
+            self.on_view_change()
+
+    def refresh_page(self, page_num):
+        if page_num in self._shown: self.redraw()
+
+    def set_current(self, page_num):
+        """Outlines the current page and scrolls it into view."""
+        if page_num == self.current: return
+        self.current = page_num
+        visible = self.visible_pages()
+        if self.count and not visible.start < page_num < visible.stop - 1:
+            self.canvas.yview_moveto(max(0, page_num - 1) / self.count)
+        self.redraw()
+
+    def _on_scroll(self, first, last):
+        self.v_scroll.set(first, last)
+        self.redraw()
+
+    def _on_click(self, event):
+        page_num = int(self.canvas.canvasy(event.y) // self.SLOT_HEIGHT)
+        if 0 <= page_num < self.count: self.on_select(page_num)
 
 class TextInputDialog(simpledialog.Dialog):
     """A custom dialog to get multi-line text input from the user."""
@@ -33,7 +637,332 @@ class RenameDialog(simpledialog.Dialog):
     def apply(self):
         self.result = self.entry.get()
 
+class PageCache:
+    """A memory-bounded LRU cache for rasterized and composited page images."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None: return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, nbytes):
+        self.discard(key)
+        if nbytes > self.max_bytes: return
+        self._entries[key] = (value, nbytes)
+        self.current_bytes += nbytes
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_bytes
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry: self.current_bytes -= entry[1]
+
+    def discard_where(self, predicate):
+        for key in [k for k in self._entries if predicate(k)]: self.discard(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+class PrefetchScheduler:
+    """Rasterizes pages ahead of the reader in worker processes and hands them to the Tk thread.
+
+    PyMuPDF holds the GIL while it renders, so a render on a thread would stall the Tk thread all the same.
+    Each worker keeps the last document open. Only `workers` jobs are submitted at a time, so scheduling a
+    new set of pages drops everything still pending from the previous call; results of older calls are ignored.
+    Only the Tk thread may call the methods.
+    """
+    def __init__(self, root, on_ready, workers=1):
+        self.root = root
+        self.on_ready = on_ready
+        self.workers = workers
+        self._pool = None
+        self._generation = 0
+        self._doc_key = None
+        self._pending = deque()
+        self._in_flight = 0
+
+    def schedule(self, doc_key, jobs):
+        """Queues (page_num, zoom) jobs for a document, in order."""
+        self._generation += 1
+        self._doc_key = doc_key
+        self._pending = deque((doc_key, page_num, zoom) for page_num, zoom in jobs)
+        self._feed()
+
+    def cancel(self):
+        """Drops the pending jobs and lets the workers close their document, so it can be renamed or replaced.
+
+        Returns the futures of the workers closing it.
+        """
+        releases = [self._pool.submit(release_render_document) for _ in range(self.workers)] if self._doc_key and self._pool else []
+        self.schedule(None, [])
+        return releases
+
+    def _feed(self):
+        while self._pending and self._in_flight < self.workers:
+            doc_key, page_num, zoom = self._pending.popleft()
+            if self._pool is None: self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            future = self._pool.submit(render_page_samples, *doc_key, page_num, zoom)
+            self._in_flight += 1
+            future.add_done_callback(lambda f, job=(self._generation, doc_key, page_num, zoom): self._post(f, *job))
+
+    def _post(self, future, *job):
+        # Runs on the executor's thread; once the window is closed there is no event loop left to report to.
+        try: self.root.after(0, self._deliver, future, *job)
+        except (RuntimeError, tk.TclError): pass
+
+    def _deliver(self, future, generation, doc_key, page_num, zoom):
+        self._in_flight -= 1
+        try: result = future.result()
+        except Exception: result = None
+        if result and generation == self._generation: self.on_ready(doc_key, page_num, zoom, *result)
+        self._feed()
+
+class UndoHistory:
+    """An undo/redo log that records what each annotation edit changed instead of copying every annotation.
+
+    An entry is a list of (action, page_num, index, annot) operations with action 'add' or 'remove'.
+    Annotation dicts are shared with the live annotation lists, so they must never be modified in place.
+    The oldest entries are dropped once there are more than max_depth of them or they exceed max_bytes.
+    """
+    def __init__(self, max_depth, max_bytes):
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.undo_bytes = 0
+
+    @property
+    def can_undo(self): return bool(self.undo_stack)
+
+    @property
+    def can_redo(self): return bool(self.redo_stack)
+
+    @staticmethod
+    def entry_size(ops):
+        """Roughly estimates the memory held by an entry, dominated by quads and text."""
+        return sum(200 + 160 * len(annot.get('quads', ())) + len(annot.get('text', '')) for _, _, _, annot in ops)
+
+    def record(self, ops):
+        self.redo_stack.clear()
+        self._push_undo(ops)
+
+    def undo(self):
+        ops = self.undo_stack.pop()
+        self.undo_bytes -= self.entry_size(ops)
+        self.redo_stack.append(ops)
+        return ops
+
+    def redo(self):
+        ops = self.redo_stack.pop()
+        self._push_undo(ops)
+        return ops
+
+    def clear(self):
+        self.undo_stack.clear(); self.redo_stack.clear()
+        self.undo_bytes = 0
+
+    def _push_undo(self, ops):
+        self.undo_stack.append(ops)
+        self.undo_bytes += self.entry_size(ops)
+        while len(self.undo_stack) > self.max_depth or (self.undo_bytes > self.max_bytes and len(self.undo_stack) > 1):
+            self.undo_bytes -= self.entry_size(self.undo_stack.popleft())
+
+class SpatialGrid:
+    """A uniform grid over PDF-space rectangles, so hit-tests only look at items near the queried area."""
+    def __init__(self, cell_size=32.0):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = {}
+
+    def _cells(self, x0, y0, x1, y1):
+        c = self.cell_size
+        for cx in range(int(x0 // c), int(x1 // c) + 1):
+            for cy in range(int(y0 // c), int(y1 // c) + 1): yield (cx, cy)
+
+    def insert(self, key, rect):
+        x0, y0, x1, y1 = self.rects[key] = tuple(rect)
+        for cell in self._cells(x0, y0, x1, y1): self.cells.setdefault(cell, []).append(key)
+
+    def remove(self, key):
+        rect = self.rects.pop(key, None)
+        if rect is None: return
+        for cell in self._cells(*rect):
+            keys = self.cells[cell]
+            keys.remove(key)
+            if not keys: del self.cells[cell]
+
+    def query(self, x0, y0, x1, y1):
+        """Returns the keys of all rectangles overlapping the area, with the same strictness as fitz.Rect.intersects."""
+        found = set()
+        for cell in self._cells(x0, y0, x1, y1):
+            for key in self.cells.get(cell, ()):
+                if key in found: continue
+                r = self.rects[key]
+                if r[0] < x1 and x0 < r[2] and r[1] < y1 and y0 < r[3]: found.add(key)
+        return found
+
+    def query_point(self, x, y):
+        """Returns the keys of all rectangles containing the point, with the same bounds as fitz.Rect.contains."""
+        keys = self.cells.get((int(x // self.cell_size), int(y // self.cell_size)), ())
+        return {k for k in keys if self.rects[k][0] <= x < self.rects[k][2] and self.rects[k][1] <= y < self.rects[k][3]}
+
+class OpenDocument:
+    """A document kept open in a background tab: everything the viewer holds per document, set aside until it is shown again."""
+    FIELDS = ('pdf_document', 'current_file_path', 'doc_key', 'saved_mtime', 'current_page', 'pages', 'page_widths', 'page_sizes',
+              'display_lists', 'word_cache', 'word_index', 'annot_index', 'temp_annots', 'dirty_pages', 'annot_revision',
+              'history', 'text_index', 'text_builder', 'text_page_count', 'search_hits', 'search_pos', 'thumbnails', 'render_ms')
+    # Rough in-memory cost of one cached word (its tuple and its index postings) and of one parsed annotation.
+    WORD_BYTES = 200
+    ANNOT_BYTES = 500
+
+    def __init__(self, app):
+        for name in self.FIELDS: setattr(self, name, getattr(app, name))
+        self.view_y = app.canvas.yview()[0]
+        try: self.file_size = os.path.getsize(self.current_file_path)
+        except OSError: self.file_size = 0
+
+    def restore(self, app):
+        for name in self.FIELDS: setattr(app, name, getattr(self, name))
+
+    def estimated_bytes(self):
+        """Estimates the memory this document holds: its parsed file, words, annotations and undo history (not its cached images)."""
+        words = sum(len(w) for w in self.text_index.pages.values())
+        words += sum(len(w) for p, w in self.word_cache.items() if p not in self.text_index.pages)
+        annots = sum(len(a) for a in self.temp_annots.values())
+        return self.file_size + words * self.WORD_BYTES + annots * self.ANNOT_BYTES + self.history.undo_bytes
+
+    def close(self):
+        if self.text_builder: self.text_builder.cancel()
+        self.pdf_document.close()
+
+class PerfMonitor:
+    """Times named stages of the hot paths for the on-canvas HUD and, optionally, a JSONL trace and a cProfile dump.
+
+    Stages nest; each records its own time without that of the stages inside it. While disabled, stage()
+    hands back one shared no-op context, so the instrumented code only pays for the method call.
+    """
+    HISTORY = 50
+    _IDLE = nullcontext()
+
+    def __init__(self, modes=(), folder=None):
+        self.modes = set(modes)
+        self.folder = folder or os.path.expanduser("~")
+        self.enabled = False
+        self.recent = {}
+        self.counts = {}
+        self.trace = None
+        self.profiler = None
+        self.trace_path = self.profile_path = None
+        self._started = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        """Reads PDF_VIEWER_PERF: a comma-separated list of 'hud', 'trace' and 'profile' (any other value means 'hud')."""
+        value = os.environ.get("PDF_VIEWER_PERF", "").strip().lower()
+        modes = {m.strip() for m in value.split(",") if m.strip() in ('hud', 'trace', 'profile')}
+        if value and not modes: modes = {'hud'}
+        monitor = cls(modes, os.environ.get("PDF_VIEWER_PERF_DIR"))
+        if modes: monitor.enable()
+        return monitor
+
+    def enable(self):
+        if self.enabled: return
+        self.enabled = True
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if 'trace' in self.modes and not self.trace:
+            self.trace_path = os.path.join(self.folder, f"pdf_viewer_perf-{stamp}.jsonl")
+            self.trace = open(self.trace_path, "a", encoding="utf-8")
+            self.trace.write(json.dumps({'session': stamp, 'pid': os.getpid(), 'python': sys.version.split()[0], 'pymupdf': fitz.VersionBind}) + "\n")
+            atexit.register(self.close)
+        if 'profile' in self.modes and not self.profiler:
+            # cProfile only follows the thread that enables it, which here is the Tk thread.
+            self.profile_path = os.path.join(self.folder, f"pdf_viewer_perf-{stamp}.prof")
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            atexit.register(self.close)
+
+    def disable(self):
+        self.enabled = False
+        self.close()
+
+    def close(self):
+        """Flushes the trace and writes the profile, if they were requested; safe to call more than once."""
+        with self._lock:
+            if self.trace: self.trace.close(); self.trace = None
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_path)
+            self.profiler = None
+
+    def stage(self, name, **info):
+        return self._timed(name, info) if self.enabled else self._IDLE
+
+    @contextmanager
+    def _timed(self, name, info):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None: stack = self._local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try: yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack: stack[-1] += elapsed
+            self.record(name, (elapsed - nested) * 1000, info)
+
+    def record(self, name, ms, info=None):
+        if name not in self.recent: self.recent[name] = deque(maxlen=self.HISTORY)
+        self.recent[name].append(ms)
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.trace:
+            line = {'t': round(time.perf_counter() - self._started, 6), 'stage': name, 'ms': round(ms, 3),
+                    'thread': threading.current_thread().name, **(info or {})}
+            with self._lock:
+                if self.trace: self.trace.write(json.dumps(line, default=str) + "\n")
+
+    def summary(self):
+        """Returns (stage, last ms, mean ms, max ms, count) for every stage seen, over its recent history."""
+        rows = []
+        for name, samples in list(self.recent.items()):
+            samples = list(samples)
+            if samples: rows.append((name, samples[-1], sum(samples) / len(samples), max(samples), self.counts[name]))
+        return rows
+
 class PDFViewerApp:
+    # Byte budget shared by cached base rasters and composited page images.
+    PAGE_CACHE_BYTES = int(os.environ.get("PDF_VIEWER_CACHE_MB", "256")) * 1024 * 1024
+    # Number of pages on each side of the current one that are rasterized ahead of time.
+    PREFETCH_PAGES = 2
+    # Page objects kept loaded, most recently used first.
+    LOADED_PAGES = 64
+    # Until a sharp render of the document was quicker than this, pages are rendered in the background and stand-ins
+    # shown meanwhile: the thumbnail, a render of a cached display list at PREVIEW_SCALE of the zoom, or a blank page.
+    # Once one was quicker, pages are rendered directly until one is not. 0 renders every page in the background.
+    PROGRESSIVE_MS = float(os.environ.get("PDF_VIEWER_PROGRESSIVE_MS", "50"))
+    PREVIEW_SCALE = 0.25
+    # Limits of the undo history, in edits and in estimated bytes.
+    UNDO_DEPTH = 1000
+    UNDO_BYTES = 64 * 1024 * 1024
+    # Pages larger than this many pixels at the current zoom are rendered in tiles, and only where visible.
+    TILED_RENDER_PIXELS = 4000000
+    TILE_SIZE = 512
+    # Worker processes that read metadata and thumbnails for the folder index.
+    INDEX_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+    # Vertical space between pages in continuous mode.
+    PAGE_GAP = 10
+    # Documents kept open in tabs, and the memory budget of those in the background; the least recently used are closed first.
+    OPEN_DOCUMENTS = 8
+    DOCUMENT_POOL_BYTES = int(os.environ.get("PDF_VIEWER_DOCS_MB", "256")) * 1024 * 1024
+
     def __init__(self, root):
         self.root = root
         self.root.title("PDF Viewer Application")
@@ -44,10 +973,57 @@ class PDFViewerApp:
         self.pdf_files = []
         self.current_folder = ""
         self.current_file_path = ""
-        self.rendered_pdf_image = None
+        self.placed_pages = {}
+        self.tiled_pages = {}
+        self.visible_tiles = {}
+        self.display_lists = {}
+        self._view_job = None
+        self.pages = OrderedDict()
+        self.page_widths = {}
+        self.page_sizes = None
+        self.resize_source = None
+        self.layout_key = None
+        self.page_tops = []
+        self.layout_height = 0
         self._resize_job = None
         self.current_page = 0
+        self.doc_key = None
+        self.page_cache = PageCache(self.PAGE_CACHE_BYTES)
+        self.prefetcher = PrefetchScheduler(root, self.on_prefetch_ready)
+        # Renders the sharp version of a page shown as a preview; kept apart so prefetching never delays it.
+        self.refiner = PrefetchScheduler(root, self.on_refined)
         self.config_path = os.path.join(os.path.expanduser("~"), ".pdf_annotator_config.txt")
+        self.session_path = os.path.join(os.path.expanduser("~"), ".pdf_annotator_session.json")
+        self.pending_open = None
+        self._startup_pending = True
+        self.index_db_path = os.path.join(os.path.expanduser("~"), ".pdf_annotator_index.sqlite3")
+        self.folder_index = FolderIndex(self.index_db_path)
+        self.file_info = {}
+        self.index_pool = None
+        self.index_queue = deque()
+        self.index_in_flight = 0
+        self._index_commit_job = None
+        self.preview_name = None
+        self.folder_watcher = None
+        self.saved_mtime = None
+        self.text_store = TextStore(self.index_db_path)
+        self.thumb_store = ThumbnailStore(self.index_db_path)
+        self.library_search = LibrarySearch(self.index_db_path)
+        self.library_window = None
+        self.text_index = TextIndex()
+        self.text_builder = None
+        self.text_page_count = 0
+        self.thumbnails = {}
+        self.thumb_renderer = None
+        self.thumb_pool = None
+        self.render_ms = None
+        self.preview_image = None
+        self.preview_page = None
+        self.search_query = ""
+        self.search_hits = []
+        self.search_pos = -1
+        self.perf = PerfMonitor.from_environment()
+        self._perf_hud_job = None
         
         # Annotation Management
         self.highlight_mode = False
@@ -56,10 +1032,23 @@ class PDFViewerApp:
         self.eraser_mode = False # New mode for deleting annotations
         self.drag_start_pos = None
         self.word_cache = {}
+        self.word_index = {}
+        self.annot_index = {}
         self.current_color = (1, 1, 0)
         self.temp_annots = {}
-        self.undo_stack = []
-        self.redo_stack = []
+        self.dirty_pages = set()
+        self.annot_revision = {}
+        self._revision_counter = itertools.count(1)
+        self.history = UndoHistory(self.UNDO_DEPTH, self.UNDO_BYTES)
+        self.save_thread = None
+        self.save_path = None
+        self.save_progress = None
+        self._save_again = False
+        self._save_show_success = False
+        self._after_save = []
+        self.open_docs = OrderedDict()
+        self.tabs = []
+        self.tab_widgets = {}
 
         # --- Main Layout using PanedWindow ---
         self.main_pane = ttk.PanedWindow(root, orient=tk.HORIZONTAL)
@@ -72,26 +1061,26 @@ class PDFViewerApp:
         # Right Panel (PDF Viewer)
         right_frame = tk.Frame(self.main_pane, bg="gray")
         self.main_pane.add(right_frame, weight=4)
-        right_frame.bind("<Configure>", self.on_resize)
 
         # --- Widgets for Left Panel ---
         select_button = ttk.Button(left_frame, text="Select Folder", command=self.select_folder)
         select_button.pack(pady=10, padx=10, fill=tk.X)
+        self.watch_var = tk.BooleanVar(value=True)
+        watch_check = ttk.Checkbutton(left_frame, text="Watch folder for changes", variable=self.watch_var, command=self.update_folder_watch)
+        watch_check.pack(padx=10, pady=(0, 10), anchor=tk.W)
+        search_button = ttk.Button(left_frame, text="Search Folder (Ctrl+Shift+F)", command=self.open_library_search)
+        search_button.pack(padx=10, pady=(0, 10), fill=tk.X)
         
-        list_frame = tk.Frame(left_frame)
-        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
-        self.file_listbox = tk.Listbox(list_frame, selectmode=tk.SINGLE, exportselection=False, font=("Arial", 11))
-        
-        v_scroll_list = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.file_listbox.yview)
-        h_scroll_list = ttk.Scrollbar(list_frame, orient=tk.HORIZONTAL, command=self.file_listbox.xview)
-        self.file_listbox.configure(yscrollcommand=v_scroll_list.set, xscrollcommand=h_scroll_list.set)
-        v_scroll_list.pack(side=tk.RIGHT, fill=tk.Y)
-        h_scroll_list.pack(side=tk.BOTTOM, fill=tk.X)
-        self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.preview_label = ttk.Label(left_frame, compound=tk.TOP, justify=tk.LEFT, background="white")
+        self.preview_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 10))
+
+        self.file_listbox = VirtualListbox(left_frame, self.file_label, font=("Arial", 11))
+        self.file_listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
 
         self.file_listbox.bind("<<ListboxSelect>>", self.on_file_select)
         self.file_listbox.bind("<Button-3>", self.show_context_menu)
         self.file_listbox.bind("<Return>", self.on_enter_press)
+        self.file_listbox.bind("<Motion>", self.on_file_hover)
 
 
         # --- Widgets for Right Panel ---
@@ -127,6 +1116,12 @@ class PDFViewerApp:
         self.zoom_menu = ttk.Combobox(top_bar, textvariable=self.zoom_var, values=zoom_options, state="readonly", width=12)
         self.zoom_menu.pack(side=tk.LEFT, padx=5, pady=5)
         self.zoom_menu.bind("<<ComboboxSelected>>", lambda e: self.render_current_page(reset_scroll=False))
+        self.continuous_var = tk.BooleanVar(value=False)
+        continuous_check = ttk.Checkbutton(top_bar, text="Continuous", variable=self.continuous_var, command=self.toggle_continuous)
+        continuous_check.pack(side=tk.LEFT, padx=5, pady=5)
+        self.thumbs_var = tk.BooleanVar(value=True)
+        thumbs_check = ttk.Checkbutton(top_bar, text="Thumbnails", variable=self.thumbs_var, command=self.toggle_thumbnails)
+        thumbs_check.pack(side=tk.LEFT, padx=5, pady=5)
         
         self.prev_page_button = ttk.Button(top_bar, text="< Prev", command=self.prev_page, state=tk.DISABLED)
         self.prev_page_button.pack(side=tk.LEFT, padx=(10, 2), pady=5)
@@ -135,13 +1130,38 @@ class PDFViewerApp:
         self.next_page_button = ttk.Button(top_bar, text="Next >", command=self.next_page, state=tk.DISABLED)
         self.next_page_button.pack(side=tk.LEFT, padx=(2, 10), pady=5)
 
+        # Find bar, shown by Ctrl+F
+        self.find_bar = tk.Frame(right_frame, bg="white")
+        self.find_var = tk.StringVar()
+        self.find_entry = ttk.Entry(self.find_bar, textvariable=self.find_var, width=30)
+        self.find_entry.pack(side=tk.LEFT, padx=(10, 2), pady=5)
+        # Arrow keys move the cursor here instead of turning pages.
+        self.find_entry.bindtags((self.find_entry, "TEntry", "all"))
+        self.find_entry.bind("<Return>", lambda e: self.find_next(1))
+        self.find_entry.bind("<Shift-Return>", lambda e: self.find_next(-1))
+        self.find_entry.bind("<Escape>", lambda e: self.close_find_bar())
+        ttk.Button(self.find_bar, text="< Prev", command=lambda: self.find_next(-1)).pack(side=tk.LEFT, padx=2, pady=5)
+        ttk.Button(self.find_bar, text="Next >", command=lambda: self.find_next(1)).pack(side=tk.LEFT, padx=2, pady=5)
+        self.find_status = tk.Label(self.find_bar, text="", bg="white", font=("Arial", 10))
+        self.find_status.pack(side=tk.LEFT, padx=10, pady=5)
+        ttk.Button(self.find_bar, text="Close", command=self.close_find_bar).pack(side=tk.RIGHT, padx=10, pady=5)
+        self.top_bar = top_bar
+
+        # Tabs of the open documents
+        self.tab_bar = tk.Frame(right_frame, bg="lightgray")
+        self.tab_bar.pack(fill=tk.X)
+        self.tab_var = tk.StringVar()
+
         canvas_frame = tk.Frame(right_frame, bg="lightgray", bd=0, highlightthickness=0)
         canvas_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.thumb_strip = ThumbnailStrip(canvas_frame, lambda page_num: self.thumbnails.get(page_num), self.on_thumbnail_click, self.prioritize_thumbnails)
+        self.thumb_strip.pack(side=tk.LEFT, fill=tk.Y)
         
         self.canvas = tk.Canvas(canvas_frame, bg="lightgray")
         self.v_scroll = ttk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=self.canvas.yview)
         self.h_scroll = ttk.Scrollbar(canvas_frame, orient=tk.HORIZONTAL, command=self.canvas.xview)
-        self.canvas.configure(yscrollcommand=self.v_scroll.set, xscrollcommand=self.h_scroll.set)
+        self.canvas.configure(yscrollcommand=self.on_canvas_yscroll, xscrollcommand=self.on_canvas_xscroll)
         
         self.v_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.h_scroll.pack(side=tk.BOTTOM, fill=tk.X)
@@ -149,10 +1169,14 @@ class PDFViewerApp:
 
         # --- Bind global events ---
         self.root.bind("<Control-s>", lambda event: self.save_pdf())
+        self.root.bind("<Control-f>", lambda event: self.open_find_bar())
+        self.root.bind("<Control-F>", lambda event: self.open_library_search())
+        self.root.bind("<Control-P>", lambda event: self.toggle_perf_hud())
         self.root.bind("<Control-z>", lambda event: self.undo())
         self.root.bind("<Control-y>", lambda event: self.redo())
         self.root.bind("<Left>", lambda event: self.prev_page())
         self.root.bind("<Right>", lambda event: self.next_page())
+        self.canvas.bind("<Configure>", self.on_resize)
         self.canvas.bind("<MouseWheel>", self._on_mousewheel)
         self.canvas.bind("<Button-4>", self._on_mousewheel)
         self.canvas.bind("<Button-5>", self._on_mousewheel)
@@ -164,7 +1188,39 @@ class PDFViewerApp:
         self.canvas.bind("<Home>", self.scroll_page_top)
         self.canvas.bind("<End>", self.scroll_page_bottom)
         
-        self.root.after(100, self.load_last_folder)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after_idle(self.restore_session)
+        if self.perf.enabled: self._perf_hud_job = self.root.after(500, self.refresh_perf_hud)
+
+    def on_canvas_yscroll(self, first, last):
+        self.v_scroll.set(first, last)
+        self.schedule_view_update()
+
+    def on_canvas_xscroll(self, first, last):
+        self.h_scroll.set(first, last)
+        self.schedule_view_update()
+
+    # --- Performance HUD ---
+    def toggle_perf_hud(self):
+        """Turns stage timing and its overlay on or off (Ctrl+Shift+P)."""
+        if self.perf.enabled: self.perf.disable()
+        else: self.perf.enable()
+        self.refresh_perf_hud()
+
+    def refresh_perf_hud(self):
+        """Redraws the timing overlay in the top-left corner of the view, twice a second while timing is on."""
+        if self._perf_hud_job: self.root.after_cancel(self._perf_hud_job); self._perf_hud_job = None
+        self.canvas.delete("perf_hud")
+        if not self.perf.enabled: return
+        lines = [f"{'stage':<13}{'last':>8}{'mean':>8}{'max':>8}{'n':>6}"]
+        lines += [f"{name:<13}{last:8.1f}{mean:8.1f}{peak:8.1f}{count:6d}" for name, last, mean, peak, count in self.perf.summary()]
+        lines.append(f"page cache {self.page_cache.current_bytes / 2**20:.0f} of {self.page_cache.max_bytes / 2**20:.0f} MB")
+        if self.perf.trace: lines.append(f"trace: {os.path.basename(self.perf.trace_path)}")
+        x, y = self.canvas.canvasx(0) + 8, self.canvas.canvasy(0) + 8
+        text = self.canvas.create_text(x + 6, y + 4, text="\n".join(lines), anchor=tk.NW, fill="#00ff66", font=("Courier", 9), tags="perf_hud")
+        x0, y0, x1, y1 = self.canvas.bbox(text)
+        self.canvas.tag_lower(self.canvas.create_rectangle(x0 - 6, y0 - 4, x1 + 6, y1 + 4, fill="black", outline="", tags="perf_hud"), text)
+        self._perf_hud_job = self.root.after(500, self.refresh_perf_hud)
 
     def _on_mousewheel(self, event):
         if event.state & 0x1:
@@ -179,32 +1235,192 @@ class PDFViewerApp:
         elif event.keysym == 'Down': self.canvas.yview_scroll(2, "units")
 
     def on_resize(self, event):
+        """Stretches the shown page while the window or the divider is being dragged, and renders it once the size settles."""
         if self._resize_job: self.root.after_cancel(self._resize_job)
         if self.zoom_var.get() == "Page Width":
-            self._resize_job = self.root.after(300, lambda: self.render_current_page(reset_scroll=False))
+            self.rescale_page_view()
+            self._resize_job = self.root.after(300, self.finish_resize)
+
+    def rescale_page_view(self):
+        """Shows the current page scaled from its last render to the current zoom, without rasterizing it again.
+
+        Only a page placed as one image is scaled; continuous mode and tiled pages wait for finish_resize.
+        """
+        if not self.pdf_document or self.layout_key or self.current_page not in self.placed_pages: return
+        item, _, photo_key, _ = self.placed_pages[self.current_page]
+        page = self.get_page(self.current_page)
+        zoom = self.get_page_zoom(page)
+        if self.resize_source is None:
+            if round(zoom, 4) == photo_key[2]: return
+            base_image = self.page_cache.get(photo_key[:3])
+            if base_image is None: return
+            with annotated_image(base_image, self.get_page_annots(self.current_page), photo_key[2]) as image: self.resize_source = image
+        rect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+        with self.perf.stage("rescale", page=self.current_page):
+            photo = ImageTk.PhotoImage(self.resize_source.resize((rect.width, rect.height), Image.BILINEAR))
+        self.canvas.itemconfig(item, image=photo)
+        self.placed_pages[self.current_page] = (item, photo, photo_key, self.placed_pages[self.current_page][3])
+        self.canvas.config(scrollregion=(0, 0, rect.width, rect.height))
+        self.draw_search_hits()
+
+    def finish_resize(self):
+        self._resize_job = None
+        self.resize_source = None
+        self.render_current_page(reset_scroll=False)
 
-    def select_folder(self, folder_path=None, file_to_select=None):
+    def select_folder(self, folder_path=None, file_to_select=None, page_num=None, scroll=None):
         if folder_path is None: folder_path = filedialog.askdirectory()
         if not folder_path: return
         
-        self.save_last_folder(folder_path)
         self.current_folder = folder_path
-        self.pdf_files = sorted([f for f in os.listdir(folder_path) if f.lower().endswith(".pdf")])
-        self.file_listbox.delete(0, tk.END)
-        for i, pdf_file in enumerate(self.pdf_files):
-            self.file_listbox.insert(tk.END, f"{i + 1}. {pdf_file}")
-        
-        if self.pdf_files:
-            index_to_select = 0
-            if file_to_select:
-                try: index_to_select = self.pdf_files.index(file_to_select)
-                except ValueError: pass
-            
-            self.file_listbox.selection_set(index_to_select)
-            self.file_listbox.focus_set()
-            self.on_file_select(None)
-        else:
-            self.canvas.delete("all")
+        self.save_session()
+        # The listing from the last visit is shown at once and checked against the disk in the background.
+        self.file_info = self.folder_index.cached(folder_path)
+        self.pdf_files = sorted(self.file_info)
+        self.file_listbox.set_count(len(self.pdf_files))
+        self.index_queue = deque()
+        self.update_folder_watch()
+        threading.Thread(target=self._list_folder_worker, args=(folder_path,), daemon=True, name="folder-list").start()
+
+        self.pending_open = (file_to_select, page_num, scroll)
+        # A file that is not in the cached listing yet is opened once the folder has been listed.
+        if self.pdf_files and (not file_to_select or file_to_select in self.file_info): self.open_pending_file()
+
+    def _list_folder_worker(self, folder):
+        try: listing, error = list_pdfs(folder), None
+        except OSError as e: listing, error = None, e
+        try: self.root.after(0, self.on_folder_listed, folder, listing, error)
+        except (RuntimeError, tk.TclError): pass # The window was closed.
+
+    def on_folder_listed(self, folder, listing, error):
+        """Replaces the cached listing with the one read from disk and queues new and changed files for indexing."""
+        if folder != self.current_folder: return
+        if error:
+            self.pending_open = None
+            self.mark_interactive()
+            return messagebox.showerror("Folder Error", f"Could not list {folder}:\n{error}")
+        selected = self.pdf_files[self.file_listbox.selected] if self.file_listbox.selected is not None else None
+        self.file_info, stale = self.folder_index.update(folder, listing)
+        self.pdf_files = sorted(self.file_info)
+        self.file_listbox.set_count(len(self.pdf_files))
+        index = self.file_row(selected) if selected else None
+        if index is None: self.file_listbox.selection_clear()
+        else: self.file_listbox.selection_set(index)
+        # Only new and changed files are read; results from a previous folder are still stored but not shown.
+        self.index_queue = deque((folder,) + job for job in sorted(stale))
+        self.feed_index_pool()
+        if self.pending_open: self.open_pending_file()
+
+    def open_pending_file(self):
+        """Opens the file a folder was selected with (or its first file) at the requested page and scroll position."""
+        name, page_num, scroll = self.pending_open
+        self.pending_open = None
+        if not self.pdf_files:
+            self.clear_page_view()
+            return self.mark_interactive()
+        index = self.file_row(name) if name else None
+        if index is None: index, page_num, scroll = 0, None, None
+        self.file_listbox.selection_set(index)
+        self.file_listbox.see(index)
+        self.file_listbox.focus_set()
+        self.show_document(os.path.join(self.current_folder, self.pdf_files[index]), page_num)
+        if scroll is not None: self.canvas.yview_moveto(scroll)
+        self.root.after_idle(self.mark_interactive)
+
+    def file_label(self, index):
+        name = self.pdf_files[index]
+        info = self.file_info.get(name)
+        return f"{index + 1}. {name}  ({info['pages']} p.)" if info else f"{index + 1}. {name}"
+
+    def feed_index_pool(self):
+        """Keeps the index workers busy without queueing the whole folder, so switching folders drops the backlog."""
+        while self.index_queue and self.index_in_flight < 2 * self.INDEX_WORKERS:
+            job = self.index_queue.popleft()
+            if self.index_pool is None: self.index_pool = ProcessPoolExecutor(max_workers=self.INDEX_WORKERS)
+            future = self.index_pool.submit(read_pdf_info, os.path.join(job[0], job[1]))
+            self.index_in_flight += 1
+            future.add_done_callback(lambda f, job=job: self.root.after(0, self.on_file_info, job, f))
+
+    def on_file_info(self, job, future):
+        self.index_in_flight -= 1
+        folder, name, size, mtime = job
+        try: pages, title, thumbnail = future.result()
+        except Exception: pages, title, thumbnail = 0, '', b''
+        self.folder_index.store(folder, name, size, mtime, pages, title, thumbnail)
+        self.schedule_index_commit()
+        index = self.file_row(name)
+        if folder == self.current_folder and index is not None:
+            self.file_info[name] = {'pages': pages, 'title': title, 'size': size, 'mtime': mtime}
+            self.file_listbox.refresh_row(index)
+        self.feed_index_pool()
+
+    def schedule_index_commit(self):
+        if not self._index_commit_job: self._index_commit_job = self.root.after(1000, self.commit_folder_index)
+
+    def commit_folder_index(self):
+        self._index_commit_job = None
+        self.folder_index.commit()
+
+    def file_row(self, name):
+        """Returns the row of a file in the sorted file list, or None."""
+        index = bisect.bisect_left(self.pdf_files, name)
+        return index if index < len(self.pdf_files) and self.pdf_files[index] == name else None
+
+    def on_file_hover(self, event):
+        """Shows the cached thumbnail and metadata of the file under the mouse."""
+        index = self.file_listbox.nearest(event.y)
+        if not 0 <= index < len(self.pdf_files) or self.pdf_files[index] == self.preview_name: return
+        self.preview_name = name = self.pdf_files[index]
+        info = self.file_info.get(name)
+        if not info: return self.preview_label.config(image="", text=name)
+        thumbnail = self.folder_index.thumbnail(self.current_folder, name)
+        self.preview_photo = ImageTk.PhotoImage(data=thumbnail) if thumbnail else None
+        size = info['size']
+        details = f"{info['pages']} pages, " + (f"{size / 1e6:.1f} MB" if size >= 1e6 else f"{max(1, size // 1000)} KB")
+        self.preview_label.config(image=self.preview_photo or "", text=f"{info['title']}\n{details}" if info['title'] else details)
+
+    def update_folder_watch(self):
+        if self.folder_watcher: self.folder_watcher.stop(); self.folder_watcher = None
+        if self.watch_var.get() and self.current_folder: self.folder_watcher = FolderWatcher(self.root, self.current_folder, self.on_folder_changes)
+
+    def on_folder_changes(self, folder, names):
+        """Applies files added, removed or changed by other programs to the list, and reloads the open document if it changed."""
+        if folder != self.current_folder: return
+        selected = self.pdf_files[self.file_listbox.selected] if self.file_listbox.selected is not None else None
+        for name in sorted(names):
+            try: stat = os.stat(os.path.join(folder, name))
+            except OSError: stat = None
+            index = self.file_row(name)
+            if stat is None:
+                if index is None: continue
+                del self.pdf_files[index]; del self.file_info[name]
+                self.folder_index.forget(folder, name)
+                continue
+            if index is None:
+                self.pdf_files.insert(bisect.bisect_left(self.pdf_files, name), name)
+                self.file_info[name] = None
+            info = self.file_info[name]
+            if not info or (info['size'], info['mtime']) != (stat.st_size, stat.st_mtime): self.index_queue.append((folder, name, stat.st_size, stat.st_mtime))
+        self.file_listbox.set_count(len(self.pdf_files))
+        # Rows after an insertion or removal moved, so the selection follows its file.
+        if selected is not None:
+            index = self.file_row(selected)
+            if index is None: self.file_listbox.selection_clear()
+            else: self.file_listbox.selection_set(index)
+        self.schedule_index_commit()
+        self.feed_index_pool()
+
+        if self.pdf_document and os.path.basename(self.current_file_path) in names: self.check_document_changed()
+
+    def check_document_changed(self):
+        """Reloads the open document if another program changed it, asking first if that would drop unsaved edits."""
+        try: mtime = os.path.getmtime(self.current_file_path)
+        except OSError: return
+        if self.save_thread or mtime in (self.doc_key[1], self.saved_mtime): return
+        self.saved_mtime = mtime # Ask only once per change.
+        name = os.path.basename(self.current_file_path)
+        if self.dirty_pages and not messagebox.askyesno("File Changed", f"{name} was changed by another program.\nReload it and discard your unsaved annotations?"): return
+        self.open_document(page_num=self.current_page, reset_scroll=False)
 
     def on_enter_press(self, event):
         """Selects the focused item when Enter is pressed."""
@@ -223,103 +1439,483 @@ class PDFViewerApp:
 
         self.file_listbox.selection_clear(0, tk.END)
         self.file_listbox.selection_set(selected_indices[0])
-        selected_item = self.file_listbox.get(selected_indices[0])
-
-        try: selected_file = selected_item.split('. ', 1)[1]
+        try: selected_file = self.pdf_files[selected_indices[0]]
         except IndexError: return
 
-        new_file_path = os.path.join(self.current_folder, selected_file)
-        if new_file_path == self.current_file_path and self.pdf_document: return
-        
-        self.current_file_path = new_file_path
-        self.root.title("PDF Viewer Application")
+        self.show_document(os.path.join(self.current_folder, selected_file))
+
+    # --- Tabs ---
+    def show_document(self, path, page_num=None):
+        """Shows a document in its tab: instantly if it is still open in the pool, else opened from disk."""
+        if path == self.current_file_path and self.pdf_document:
+            if page_num is not None: self.go_to_page(page_num)
+            return
+        self.stash_document()
+        doc = self.open_docs.pop(path, None)
+        if doc is None:
+            self.current_file_path = path
+            self.open_document(page_num or 0)
+            if not self.pdf_document: return self.update_tabs()
+        else:
+            self.prefetcher.cancel()
+            doc.restore(self)
+            self.thumb_strip.set_count(len(self.pdf_document))
+            self.start_thumbnails()
+            self.save_button.config(state=tk.NORMAL)
+            self.update_undo_redo_state()
+            if page_num is not None: self.go_to_page(page_num)
+            else:
+                self.render_current_page(reset_scroll=True)
+                self.canvas.yview_moveto(doc.view_y)
+            if self.search_query: self.run_search()
+            else: self.update_find_status()
+            # It may have been changed by another program while it was in the background.
+            self.check_document_changed()
+        if path not in self.tabs: self.tabs.append(path)
+        self.trim_document_pool()
+        self.update_tabs()
+        self.save_session()
+        folder, name = os.path.split(path)
+        row = self.file_row(name) if folder == self.current_folder else None
+        if row is None: self.file_listbox.selection_clear()
+        else: self.file_listbox.selection_set(row); self.file_listbox.see(row)
+
+    def go_to_page(self, page_num):
+        if self.layout_key: self.canvas.yview_moveto(self.page_tops[page_num] / self.layout_height)
+        else:
+            self.current_page = page_num
+            self.render_current_page(reset_scroll=True)
 
+    def stash_document(self):
+        """Moves the shown document into the pool of background documents, leaving the viewer without one."""
+        if not self.pdf_document: return
+        self.prefetcher.cancel()
+        self.refiner.cancel()
+        self.open_docs[self.current_file_path] = OpenDocument(self)
+        self.reset_document_state()
+
+    def reset_document_state(self):
+        self.pdf_document = None
+        self.current_file_path = ""
+        self.doc_key = None
+        self.saved_mtime = None
+        self.current_page = 0
+        self.pages = OrderedDict()
+        self.page_widths = {}
+        self.page_sizes = None
+        self.display_lists = {}
+        self.word_cache = {}
+        self.word_index = {}
+        self.annot_index = {}
+        self.temp_annots = {}
+        self.dirty_pages = set()
+        self.annot_revision = {}
+        self.history = UndoHistory(self.UNDO_DEPTH, self.UNDO_BYTES)
+        self.text_index = TextIndex()
+        self.text_builder = None
+        self.text_page_count = 0
+        self.thumbnails = {}
+        self.stop_thumbnails()
+        self.render_ms = None
+        self.search_hits, self.search_pos = [], -1
+
+    def document_for(self, path):
+        """Returns whatever holds the state of an open document: the viewer itself if it is shown, else its pool entry."""
+        return self if path == self.current_file_path and self.pdf_document else self.open_docs.get(path)
+
+    def trim_document_pool(self):
+        """Closes the least recently used background documents while there are too many or they use too much memory.
+
+        Documents with unsaved annotations, or being saved, are never closed this way.
+        """
+        while len(self.open_docs) >= self.OPEN_DOCUMENTS or sum(d.estimated_bytes() for d in self.open_docs.values()) > self.DOCUMENT_POOL_BYTES:
+            victim = next((path for path, doc in self.open_docs.items() if not doc.dirty_pages and path != self.save_path), None)
+            if victim is None: return
+            self.drop_document(victim)
+
+    def drop_document(self, path):
+        """Closes a document and removes its tab, discarding any unsaved annotations it has."""
+        if path == self.current_file_path and self.pdf_document:
+            self.prefetcher.cancel()
+            self.refiner.cancel()
+            doc = OpenDocument(self)
+            self.reset_document_state()
+            self.clear_page_view()
+            self.thumb_strip.set_count(0)
+            self.save_button.config(state=tk.DISABLED)
+            self.update_undo_redo_state()
+        else: doc = self.open_docs.pop(path, None)
+        if path in self.tabs: self.tabs.remove(path)
+        if doc:
+            doc.close()
+            self.page_cache.discard_where(lambda key: key[0] == doc.doc_key)
+        self.update_tabs()
+
+    def close_tab(self, path):
+        """Closes a tab, offering to save its annotations first, and shows the most recently used remaining one."""
+        doc = self.document_for(path)
+        if doc is None: return
+        if path == self.save_path: return self._after_save.append(lambda: self.close_tab(path))
+        if doc.dirty_pages:
+            answer = messagebox.askyesnocancel("Close Tab", f"Save the annotations in {os.path.basename(path)} before closing it?")
+            if answer is None: return
+            if answer:
+                self.show_document(path)
+                return self.save_pdf(show_success=False, then=lambda: self.close_tab(path))
+        was_shown = doc is self
+        self.drop_document(path)
+        if was_shown and self.open_docs: self.show_document(next(reversed(self.open_docs)))
+
+    def update_tabs(self):
+        """Adds and removes tab buttons to match the open documents and refreshes their labels; * marks unsaved annotations."""
+        for path in [p for p in self.tab_widgets if p not in self.tabs]: self.tab_widgets.pop(path)[0].destroy()
+        for path in self.tabs:
+            if path not in self.tab_widgets:
+                tab = tk.Frame(self.tab_bar, bg="lightgray")
+                button = ttk.Radiobutton(tab, variable=self.tab_var, value=path, style="Toolbutton", command=lambda p=path: self.show_document(p))
+                button.pack(side=tk.LEFT)
+                button.bind("<Button-2>", lambda e, p=path: self.close_tab(p))
+                ttk.Button(tab, text="x", width=2, command=lambda p=path: self.close_tab(p)).pack(side=tk.LEFT)
+                tab.pack(side=tk.LEFT, padx=(2, 0), pady=(2, 0))
+                self.tab_widgets[path] = (tab, button)
+            doc = self.document_for(path)
+            self.tab_widgets[path][1].config(text=os.path.basename(path) + ("*" if doc and doc.dirty_pages else ""))
+        self.tab_var.set(self.current_file_path)
+
+    def open_document(self, page_num=0, reset_scroll=True):
+        """(Re)opens current_file_path at a page, dropping all state that belonged to the previous document."""
+        self.root.title("PDF Viewer Application")
         try:
+            self.prefetcher.cancel()
             if self.pdf_document: self.pdf_document.close()
-            self.pdf_document = fitz.open(self.current_file_path)
-            self.current_page = 0
-            self.word_cache = {}
-            self.temp_annots.clear()
-            for page in self.pdf_document:
-                self.temp_annots[page.number] = []
-                for annot in page.annots():
-                    if annot.type[0] == 8: # Highlight
-                        color = annot.colors.get("stroke", (1,1,0)) or (1,1,0)
-                        quads = []
-                        try: quads = annot.quads()
-                        except AttributeError:
-                            vertices = annot.vertices
-                            if vertices and len(vertices) % 4 == 0:
-                                for i in range(0, len(vertices), 4):
-                                    quads.append(fitz.Quad(vertices[i], vertices[i+1], vertices[i+2], vertices[i+3]))
-                        if quads:
-                            bounding_rect = fitz.Rect()
-                            for q in quads: bounding_rect.include_rect(q.rect)
-                            self.temp_annots[page.number].append({'type': 'highlight', 'quads': quads, 'color': color, 'rect': bounding_rect})
-                    elif annot.type[0] == 0: # Text
-                        self.temp_annots[page.number].append({'type': 'text', 'rect': annot.rect, 'text': annot.info.get('content', ''), 'color': annot.colors.get('fill', (0,0,0)) or (0,0,0)})
-            
-            self.undo_stack.clear()
-            self.redo_stack.clear()
+            if self.text_builder: self.text_builder.cancel()
+            path = self.current_file_path
+            self.reset_document_state()
+            self.current_file_path = path
+            with self.perf.stage("fitz.open", file=os.path.basename(path)):
+                self.pdf_document = fitz.open(path)
+            self.doc_key = (path, os.path.getmtime(path))
+            self.current_page = max(0, min(page_num, len(self.pdf_document) - 1))
             self.update_undo_redo_state()
-            self.render_current_page(reset_scroll=True)
+            self.start_text_index()
+            self.thumb_strip.set_count(len(self.pdf_document))
+            self.start_thumbnails()
+            self.render_current_page(reset_scroll=reset_scroll)
             self.save_button.config(state=tk.NORMAL)
         except Exception as e:
-            messagebox.showerror("Error", f"Error opening PDF {selected_file}:\n{e}")
-            self.canvas.delete("all")
+            messagebox.showerror("Error", f"Error opening PDF {os.path.basename(self.current_file_path)}:\n{e}")
+            self.clear_page_view()
             self.save_button.config(state=tk.DISABLED)
 
+    def get_page_annots(self, page_num):
+        """Returns the annotations of a page, reading them from the document the first time the page is needed."""
+        if page_num not in self.temp_annots:
+            with self.perf.stage("annot_scan", page=page_num):
+                self.temp_annots[page_num] = read_page_annots(self.get_page(page_num))
+        return self.temp_annots[page_num]
+
+    def get_page_words(self, page_num):
+        if page_num not in self.word_cache:
+            words = self.text_index.pages.get(page_num)
+            if words is None:
+                with self.perf.stage("get_text", page=page_num): words = self.get_page(page_num).get_text("words")
+            self.word_cache[page_num] = words
+        return self.word_cache[page_num]
+
+    def get_word_index(self, page_num):
+        """Returns a spatial index of the cached words of a page, keyed by their position in the word list."""
+        if page_num not in self.word_index:
+            grid = SpatialGrid()
+            for i, word in enumerate(self.get_page_words(page_num)): grid.insert(i, word[:4])
+            self.word_index[page_num] = grid
+        return self.word_index[page_num]
+
+    def get_annot_index(self, page_num):
+        """Returns a spatial index of the annotations of a page, keyed by the id of each annotation dict."""
+        if page_num not in self.annot_index:
+            grid = SpatialGrid()
+            for annot in self.get_page_annots(page_num): grid.insert(id(annot), annot['rect'])
+            self.annot_index[page_num] = grid
+        return self.annot_index[page_num]
+
     def render_current_page(self, reset_scroll=False):
         if not self.pdf_document: return
+        if self.continuous_var.get(): return self.render_continuous(reset_scroll)
         
         current_y_view = self.canvas.yview()
-        self.canvas.delete("all")
+        self.clear_page_view()
         canvas_width = self.canvas.winfo_width()
         if canvas_width <= 1: return
 
-        page = self.pdf_document.load_page(self.current_page)
-        if self.current_page not in self.word_cache: self.word_cache[self.current_page] = page.get_text("words")
+        page = self.get_page(self.current_page)
+        self.get_page_words(self.current_page)
         
         zoom = self.get_current_zoom()
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        
-        base_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples).convert("RGBA")
-        overlay = Image.new("RGBA", base_image.size, (255, 255, 255, 0))
-        draw = ImageDraw.Draw(overlay)
-        
-        page_annots = self.temp_annots.get(self.current_page, [])
-        for annot in page_annots:
-            color_rgb = annot['color']
-            color_int = (int(color_rgb[0]*255), int(color_rgb[1]*255), int(color_rgb[2]*255))
-            if annot['type'] == 'highlight':
-                color_rgba = color_int + (128,)
-                for quad in annot['quads']:
-                    points_objects = [quad.ul * mat, quad.ur * mat, quad.lr * mat, quad.ll * mat]
-                    flat_points = [(p.x, p.y) for p in points_objects]
-                    draw.polygon(flat_points, fill=color_rgba)
-            elif annot['type'] == 'text':
-                rect = annot['rect'] * mat
-                try: font = ImageFont.truetype("Arial.ttf", size=int(11 * zoom))
-                except IOError: font = ImageFont.load_default()
-                draw.multiline_text((rect.x0, rect.y0), annot['text'], fill=color_int, font=font)
-
-        final_image = Image.alpha_composite(base_image, overlay)
-        self.rendered_pdf_image = ImageTk.PhotoImage(final_image)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.rendered_pdf_image)
-        self.canvas.config(scrollregion=(0, 0, pix.width, pix.height))
+        size = self.place_preview(self.current_page, page, zoom)
+        if size is None:
+            self.refiner.schedule(self.doc_key, [])
+            size = self.place_page(self.current_page, page, zoom, 0)
+        width, height = size
+        self.canvas.config(scrollregion=(0, 0, width, height))
+        self.update_visible_tiles()
         
         if reset_scroll: self.canvas.yview_moveto(0)
         else: self.root.after(1, lambda: self.canvas.yview_moveto(current_y_view[0]))
             
+        self.draw_search_hits()
+        self.update_page_nav_buttons()
+        # Prefetching waits for the sharp render, which renders the page again when it is done.
+        if self.preview_page is not None: self.prefetcher.schedule(self.doc_key, [])
+        else: self.schedule_prefetch()
+
+    def place_preview(self, page_num, page, zoom):
+        """Shows a stand-in for a page scaled up to its size unless rendering it sharp is known to be quick.
+
+        That is its thumbnail if there is one, else a render of its cached display list at PREVIEW_SCALE of the
+        zoom, else a blank page; none of them interprets the page on the Tk thread. The sharp render is left to
+        the refiner, and scheduling another page or zoom cancels it. Returns the page's size, or None if it
+        should be rendered right away: it is cached, tiled or quick to render.
+        """
+        if self.use_tiles(page, zoom) or self.page_cache.get((self.doc_key, page_num, round(zoom, 4))) is not None: return None
+        if self.render_ms is not None and self.render_ms < self.PROGRESSIVE_MS: return None
+        # The refiner only renders the file the document was opened from.
+        try:
+            if os.path.getmtime(self.current_file_path) != self.doc_key[1]: return None
+        except OSError: return None # Deleted or renamed by another program; the watcher will catch up.
+        rect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+        jpeg, display_list = self.thumbnails.get(page_num), self.display_lists.get(page_num)
+        with self.perf.stage("preview", page=page_num, zoom=round(zoom, 4)):
+            if jpeg:
+                preview_zoom = thumbnail_zoom(page.rect)
+                with Image.open(io.BytesIO(jpeg)) as thumbnail: thumbnail = thumbnail.convert("RGB")
+                base_image = raster_from_samples(thumbnail.width, thumbnail.height, bytearray(thumbnail.tobytes()))
+            elif display_list:
+                preview_zoom = zoom * self.PREVIEW_SCALE
+                pix = display_list.get_pixmap(matrix=fitz.Matrix(preview_zoom, preview_zoom), alpha=False)
+                base_image = raster_from_samples(pix.width, pix.height, bytearray(pix.samples_mv))
+            else: base_image = None
+            if base_image is not None:
+                with annotated_image(base_image, self.get_page_annots(page_num), preview_zoom) as image:
+                    self.preview_image = ImageTk.PhotoImage(image.resize((rect.width, rect.height), Image.BILINEAR))
+                self.canvas.tag_lower(self.canvas.create_image(0, 0, anchor=tk.NW, image=self.preview_image, tags="page"))
+            else: self.canvas.tag_lower(self.canvas.create_rectangle(0, 0, rect.width, rect.height, fill="white", outline="", tags="page"))
+        self.preview_page = page_num
+        self.refiner.schedule(self.doc_key, [(page_num, zoom)])
+        return rect.width, rect.height
+
+    def on_refined(self, doc_key, page_num, zoom, width, height, samples, render_ms):
+        if doc_key != self.doc_key: return
+        self.on_prefetch_ready(doc_key, page_num, zoom, width, height, samples, render_ms)
+        # Anything that replaced the preview also cancelled or rescheduled this render.
+        if self.preview_page == page_num == self.current_page and not self.layout_key: self.render_current_page()
+
+    def render_continuous(self, reset_scroll):
+        """Lays all pages out in one scroll region and renders only the ones near the viewport."""
+        if self.canvas.winfo_width() <= 1: return
+        zoom = self.get_current_zoom()
+        layout_key = (self.doc_key, round(zoom, 4))
+        if layout_key != self.layout_key:
+            self.clear_page_view()
+            self.layout_key = layout_key
+            self.page_tops, y = [], 0
+            for _, height in self.get_page_sizes():
+                self.page_tops.append(y)
+                y += round(height * zoom) + self.PAGE_GAP
+            self.layout_height = y - self.PAGE_GAP
+            self.canvas.config(scrollregion=(0, 0, round(max(w for w, _ in self.page_sizes) * zoom), self.layout_height))
+            reset_scroll = True
+        if reset_scroll: self.canvas.yview_moveto(self.page_tops[self.current_page] / self.layout_height)
+        self.update_visible_pages()
         self.update_page_nav_buttons()
 
+    def update_visible_pages(self):
+        """Places the pages within half a screen of the viewport and evicts the images of all other pages."""
+        view_top, view_bottom = self.canvas.canvasy(0), self.canvas.canvasy(self.canvas.winfo_height())
+        margin = (view_bottom - view_top) / 2
+        first = max(0, bisect.bisect_right(self.page_tops, view_top - margin) - 1)
+        last = max(first, bisect.bisect_right(self.page_tops, view_bottom + margin) - 1)
+        zoom = self.layout_key[1]
+
+        for page_num, (item, _, photo_key, revision) in list(self.placed_pages.items()):
+            if first <= page_num <= last and revision == self.annot_revision.get(page_num, 0): continue
+            self.canvas.delete(item)
+            del self.placed_pages[page_num]
+            if not first <= page_num <= last: self.page_cache.discard(photo_key)
+        for page_num, (_, _, _, _, revision) in list(self.tiled_pages.items()):
+            if first <= page_num <= last and revision == self.annot_revision.get(page_num, 0): continue
+            del self.tiled_pages[page_num]
+            for tile in [t for t in self.visible_tiles if t[0] == page_num]: self.canvas.delete(self.visible_tiles.pop(tile)[0])
+            if not first <= page_num <= last: self.display_lists.pop(page_num, None)
+        for page_num in range(first, last + 1):
+            if page_num not in self.placed_pages and page_num not in self.tiled_pages:
+                self.place_page(page_num, self.get_page(page_num), zoom, self.page_tops[page_num])
+        self.update_visible_tiles()
+        self.draw_search_hits()
+
+        # The page under the top quarter of the viewport is the one the navigation buttons refer to.
+        current_page = max(0, bisect.bisect_right(self.page_tops, view_top + (view_bottom - view_top) / 4) - 1)
+        if current_page != self.current_page:
+            self.current_page = current_page
+            self.update_page_nav_buttons()
+            self.schedule_prefetch()
+
+    def place_page(self, page_num, page, zoom, top):
+        """Shows a page with its top edge at canvas y=top, as one image or, if it is large, as tiles. Returns its size."""
+        revision = self.annot_revision.get(page_num, 0)
+        if self.use_tiles(page, zoom):
+            page_rect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+            self.tiled_pages[page_num] = (page, zoom, top, page_rect, revision)
+            return page_rect.width, page_rect.height
+
+        image_key = (self.doc_key, page_num, round(zoom, 4))
+        photo_key = image_key + (revision,)
+        photo = self.page_cache.get(photo_key)
+        if photo is None:
+            base_image = self.page_cache.get(image_key)
+            if base_image is None:
+                with self.perf.stage("get_pixmap", page=page_num, zoom=round(zoom, 4)):
+                    start = time.perf_counter()
+                    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                    self.render_ms = (time.perf_counter() - start) * 1000
+                    base_image = raster_from_samples(pix.width, pix.height, bytearray(pix.samples_mv))
+                self.page_cache.put(image_key, base_image, pix.width * pix.height * 3)
+            page_annots = self.get_page_annots(page_num)
+            with self.perf.stage("composite", page=page_num), annotated_image(base_image, page_annots, zoom) as final_image:
+                with self.perf.stage("PhotoImage", page=page_num): photo = ImageTk.PhotoImage(final_image)
+            self.page_cache.put(photo_key, photo, photo.width() * photo.height() * 4)
+
+        item = self.canvas.create_image(0, top, anchor=tk.NW, image=photo, tags="page")
+        self.canvas.tag_lower(item)
+        # The canvas does not keep the image alive by itself, so hold a reference while it is shown.
+        self.placed_pages[page_num] = (item, photo, photo_key, revision)
+        return photo.width(), photo.height()
+
+    def clear_page_view(self):
+        self.canvas.delete("all")
+        self.preview_image = None
+        self.preview_page = None
+        self.resize_source = None
+        self.placed_pages = {}
+        self.tiled_pages = {}
+        self.visible_tiles = {}
+        self.layout_key = None
+
+    def toggle_continuous(self):
+        self.clear_page_view()
+        self.render_current_page(reset_scroll=True)
+
+    def get_page(self, page_num):
+        """Returns a page of the shown document, keeping the LOADED_PAGES most recently used ones loaded."""
+        page = self.pages.pop(page_num, None)
+        if page is None: page = self.pdf_document.load_page(page_num)
+        self.pages[page_num] = page
+        if len(self.pages) > self.LOADED_PAGES: self.pages.popitem(last=False)
+        return page
+
+    def get_page_sizes(self):
+        """Returns the unzoomed (width, height) of every page, measured once per document."""
+        if self.page_sizes is None: self.page_sizes = [(p.rect.width, p.rect.height) for p in self.pdf_document]
+        return self.page_sizes
+
+    def page_at(self, canvas_y):
+        """Returns the page under a canvas y coordinate in continuous mode."""
+        return max(0, bisect.bisect_right(self.page_tops, canvas_y) - 1)
+
+    def page_origin(self, page_num):
+        """Returns the canvas position of a page's top-left corner."""
+        return (0, self.page_tops[page_num]) if self.layout_key else (0, 0)
+
+    def use_tiles(self, page, zoom):
+        """Tells whether a page is too large at this zoom to be rasterized in one piece."""
+        return page.rotation == 0 and page.rect.width * page.rect.height * zoom * zoom > self.TILED_RENDER_PIXELS
+
+    def schedule_view_update(self):
+        if (self.tiled_pages or self.layout_key) and not self._view_job: self._view_job = self.root.after_idle(self.update_view)
+
+    def update_view(self):
+        self._view_job = None
+        if self.layout_key: self.update_visible_pages()
+        else: self.update_visible_tiles()
+
+    def update_visible_tiles(self):
+        """Places the tiles of tiled pages that intersect the visible canvas area and drops the others."""
+        size = self.TILE_SIZE
+        view = fitz.IRect(self.canvas.canvasx(0), self.canvas.canvasy(0),
+                          self.canvas.canvasx(self.canvas.winfo_width()), self.canvas.canvasy(self.canvas.winfo_height()))
+        wanted = set()
+        for page_num, (page, zoom, top, page_rect, _) in self.tiled_pages.items():
+            area = fitz.IRect(view.x0, view.y0 - top, view.x1, view.y1 - top) & page_rect
+            if area.is_empty: continue
+            wanted.update((page_num, tx, ty) for tx in range(area.x0 // size, (area.x1 - 1) // size + 1)
+                                             for ty in range(area.y0 // size, (area.y1 - 1) // size + 1))
+
+        for tile in [t for t in self.visible_tiles if t not in wanted]: self.canvas.delete(self.visible_tiles.pop(tile)[0])
+        for tile in sorted(wanted - set(self.visible_tiles)):
+            page_num, tx, ty = tile
+            page, zoom, top, _, _ = self.tiled_pages[page_num]
+            x, y, photo = self.get_tile_image(page_num, page, zoom, tx, ty)
+            item = self.canvas.create_image(x, top + y, anchor=tk.NW, image=photo, tags="tile")
+            self.canvas.tag_lower(item)
+            self.visible_tiles[tile] = (item, photo)
+
+    def get_tile_image(self, page_num, page, zoom, tx, ty):
+        """Returns the position on the page and the composited image of one tile, rasterizing it only if it is not cached."""
+        tile_key = (self.doc_key, page_num, round(zoom, 4), 'tile', tx, ty)
+        photo_key = tile_key + (self.annot_revision.get(page_num, 0),)
+        cached = self.page_cache.get(photo_key)
+        if cached: return cached
+
+        base = self.page_cache.get(tile_key)
+        if base is None:
+            size = self.TILE_SIZE
+            clip = fitz.Rect(tx * size, ty * size, (tx + 1) * size, (ty + 1) * size) / zoom
+            display_list = self.get_display_list(page_num, page)
+            with self.perf.stage("get_pixmap", page=page_num, zoom=round(zoom, 4), tile=(tx, ty)):
+                pix = display_list.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+                base = (pix.x, pix.y, raster_from_samples(pix.width, pix.height, bytearray(pix.samples_mv)))
+            self.page_cache.put(tile_key, base, pix.width * pix.height * 3)
+
+        x, y, raster = base
+        page_annots = self.get_page_annots(page_num)
+        with self.perf.stage("composite", page=page_num), annotated_image(raster, page_annots, zoom, origin=(x, y)) as tile_image:
+            with self.perf.stage("PhotoImage", page=page_num): photo = ImageTk.PhotoImage(tile_image)
+        self.page_cache.put(photo_key, (x, y, photo), photo.width() * photo.height() * 4)
+        return x, y, photo
+
+    def get_display_list(self, page_num, page):
+        """Returns the display list of a tiled page, so its tiles do not reinterpret the page content."""
+        if page_num not in self.display_lists: self.display_lists[page_num] = page.get_displaylist()
+        return self.display_lists[page_num]
+
+    def schedule_prefetch(self):
+        """Queues the neighbours of the current page that are not cached yet, nearest (and forward) first."""
+        jobs = []
+        for offset in range(1, self.PREFETCH_PAGES + 1):
+            for page_num in (self.current_page + offset, self.current_page - offset):
+                if not 0 <= page_num < len(self.pdf_document): continue
+                page = self.get_page(page_num)
+                zoom = self.get_page_zoom(page)
+                if self.use_tiles(page, zoom): continue
+                if self.page_cache.get((self.doc_key, page_num, round(zoom, 4))) is None: jobs.append((page_num, zoom))
+        self.prefetcher.schedule(self.doc_key, jobs)
+
+    def on_prefetch_ready(self, doc_key, page_num, zoom, width, height, samples, render_ms):
+        if doc_key != self.doc_key: return
+        # Background renders keep telling whether the document is still slow enough for progressive rendering.
+        self.render_ms = render_ms
+        self.page_cache.put((doc_key, page_num, round(zoom, 4)), raster_from_samples(width, height, samples), len(samples))
+
+    def mark_annots_changed(self, page_num):
+        """Bumps the annotation revision of a page so stale renders of it are not reused."""
+        self.annot_revision[page_num] = next(self._revision_counter)
+
     def update_page_nav_buttons(self):
         if not self.pdf_document: return
         total_pages = len(self.pdf_document)
         self.page_label.config(text=f"Page {self.current_page + 1} of {total_pages}")
         self.prev_page_button.config(state=tk.NORMAL if self.current_page > 0 else tk.DISABLED)
         self.next_page_button.config(state=tk.NORMAL if self.current_page < total_pages - 1 else tk.DISABLED)
+        self.thumb_strip.set_current(self.current_page)
 
     def prev_page(self):
         if self.current_page > 0: self.current_page -= 1; self.render_current_page(reset_scroll=True)
@@ -330,11 +1926,15 @@ class PDFViewerApp:
             
     def scroll_page_top(self, event=None):
         if not self.pdf_document: return
-        self.canvas.yview_moveto(0.0)
+        if self.layout_key: self.canvas.yview_moveto(self.page_tops[self.current_page] / self.layout_height)
+        else: self.canvas.yview_moveto(0.0)
 
     def scroll_page_bottom(self, event=None):
         if not self.pdf_document: return
-        self.canvas.yview_moveto(1.0)
+        if self.layout_key:
+            page_bottom = self.page_tops[self.current_page] + self.page_sizes[self.current_page][1] * self.layout_key[1]
+            self.canvas.yview_moveto((page_bottom - self.canvas.winfo_height()) / self.layout_height)
+        else: self.canvas.yview_moveto(1.0)
 
     def set_mode(self, mode):
         self.highlight_mode = mode == 'highlight'
@@ -360,6 +1960,10 @@ class PDFViewerApp:
 
     def on_canvas_click(self, event):
         self.canvas.focus_set()
+        if self.layout_key and self.pdf_document:
+            # In continuous mode, edits apply to the page that was clicked.
+            self.current_page = self.page_at(self.canvas.canvasy(event.y))
+            self.update_page_nav_buttons()
         if self.text_mode: self.add_text_annot(event)
         elif self.highlight_mode or self.select_mode: self.start_drag(event)
         elif self.eraser_mode: self.delete_annotation_at(event)
@@ -384,15 +1988,15 @@ class PDFViewerApp:
 
         selection_rect_canvas = fitz.Rect(min(start_x, end_x), min(start_y, end_y), max(start_x, end_x), max(start_y, end_y))
         
-        zoom = self.get_current_zoom()
-        words = self.word_cache.get(self.current_page, [])
-        selected_word_info = [w for w in words if (fitz.Rect(w[:4]) * zoom).intersects(selection_rect_canvas)]
+        if selection_rect_canvas.is_empty: return
+        origin_x, origin_y = self.page_origin(self.current_page)
+        selection_rect_pdf = (selection_rect_canvas + (-origin_x, -origin_y, -origin_x, -origin_y)) / self.get_current_zoom()
+        words = self.get_page_words(self.current_page)
+        selected_word_info = [words[i] for i in sorted(self.get_word_index(self.current_page).query(*selection_rect_pdf))]
         
         if not selected_word_info: return
 
         if self.highlight_mode:
-            self.undo_stack.append(copy.deepcopy(self.temp_annots))
-            self.redo_stack.clear()
             rects_to_highlight = [fitz.Rect(info[:4]) for info in selected_word_info]
             new_quads = [r.quad for r in rects_to_highlight]
             
@@ -400,11 +2004,7 @@ class PDFViewerApp:
             for r in rects_to_highlight: bounding_rect.include_rect(r)
 
             new_highlight = {'type': 'highlight', 'quads': new_quads, 'color': self.current_color, 'rect': bounding_rect}
-            if self.current_page not in self.temp_annots: self.temp_annots[self.current_page] = []
-            self.temp_annots[self.current_page].append(new_highlight)
-            
-            self.render_current_page(reset_scroll=False)
-            self.update_undo_redo_state()
+            self.edit_annots([('add', self.current_page, len(self.get_page_annots(self.current_page)), new_highlight)])
         
         elif self.select_mode:
             full_text = " ".join([info[4] for info in selected_word_info])
@@ -420,43 +2020,59 @@ class PDFViewerApp:
         if not user_text: return
 
         zoom = self.get_current_zoom()
-        canvas_x, canvas_y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        origin_x, origin_y = self.page_origin(self.current_page)
+        canvas_x, canvas_y = self.canvas.canvasx(event.x) - origin_x, self.canvas.canvasy(event.y) - origin_y
         pdf_x, pdf_y = canvas_x / zoom, canvas_y / zoom
         text_rect = fitz.Rect(pdf_x, pdf_y, pdf_x + 200, pdf_y + 50)
         
-        self.undo_stack.append(copy.deepcopy(self.temp_annots))
-        self.redo_stack.clear()
         new_text = {'type': 'text', 'rect': text_rect, 'text': user_text, 'color': self.current_color}
-        if self.current_page not in self.temp_annots: self.temp_annots[self.current_page] = []
-        self.temp_annots[self.current_page].append(new_text)
-        self.render_current_page(reset_scroll=False)
-        self.update_undo_redo_state()
+        self.edit_annots([('add', self.current_page, len(self.get_page_annots(self.current_page)), new_text)])
         
     def delete_annotation_at(self, event):
         zoom = self.get_current_zoom()
-        canvas_x, canvas_y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
-        click_point_pdf = fitz.Point(canvas_x / zoom, canvas_y / zoom)
+        origin_x, origin_y = self.page_origin(self.current_page)
+        canvas_x, canvas_y = self.canvas.canvasx(event.x) - origin_x, self.canvas.canvasy(event.y) - origin_y
+        hits = self.get_annot_index(self.current_page).query_point(canvas_x / zoom, canvas_y / zoom)
+        if not hits: return
 
-        annots_on_page = self.temp_annots.get(self.current_page, [])
+        annots_on_page = self.get_page_annots(self.current_page)
         for i in range(len(annots_on_page) - 1, -1, -1):
             annot_data = annots_on_page[i]
-            if annot_data['rect'].contains(click_point_pdf):
-                self.undo_stack.append(copy.deepcopy(self.temp_annots))
-                self.redo_stack.clear()
-                annots_on_page.pop(i)
-                self.render_current_page(reset_scroll=False)
-                self.update_undo_redo_state()
+            if id(annot_data) in hits:
+                self.edit_annots([('remove', self.current_page, i, annot_data)])
                 return
 
+    def edit_annots(self, ops):
+        """Applies a list of annotation operations as a single undoable edit."""
+        self.history.record(ops)
+        self.apply_annot_ops(ops)
+        self.render_current_page(reset_scroll=False)
+        self.update_undo_redo_state()
+
+    def apply_annot_ops(self, ops, reverse=False):
+        for action, page_num, index, annot in (reversed(ops) if reverse else ops):
+            page_annots = self.get_page_annots(page_num)
+            grid = self.annot_index.get(page_num)
+            if (action == 'add') != reverse:
+                page_annots.insert(index, annot)
+                if grid: grid.insert(id(annot), annot['rect'])
+            else:
+                page_annots.pop(index)
+                if grid: grid.remove(id(annot))
+            self.dirty_pages.add(page_num)
+            self.mark_annots_changed(page_num)
+
     def get_current_zoom(self):
         if not self.pdf_document: return 1.0
-        page = self.pdf_document.load_page(self.current_page)
-        canvas_width = self.canvas.winfo_width()
-        zoom_mode = self.zoom_var.get()
-        
-        def get_effective_page_width(p): return p.rect.height if p.rotation in [90, 270] else p.rect.width
-        if zoom_mode == "Page Width": return canvas_width / get_effective_page_width(page)
-        else: return int(zoom_mode.replace('%','')) / 100.0
+        return self.get_page_zoom(self.get_page(self.current_page))
+
+    def get_page_zoom(self, page):
+        """Returns the zoom of a page; in continuous mode all pages share the zoom that fits the widest one."""
+        if self.continuous_var.get() and self.zoom_var.get() == "Page Width":
+            return self.canvas.winfo_width() / max(w for w, _ in self.get_page_sizes())
+        width = self.page_widths.get(page.number)
+        if width is None: width = self.page_widths[page.number] = page_width(page)
+        return page_zoom(width, self.zoom_var.get(), self.canvas.winfo_width())
 
     def choose_color(self):
         color_code = askcolor(title="Choose color")
@@ -471,52 +2087,296 @@ class PDFViewerApp:
         self.color_swatch.config(bg=hex_color)
 
     def undo(self):
-        if not self.undo_stack: return
-        self.redo_stack.append(copy.deepcopy(self.temp_annots))
-        self.temp_annots = self.undo_stack.pop()
+        if not self.history.can_undo: return
+        self.apply_annot_ops(self.history.undo(), reverse=True)
         self.render_current_page(reset_scroll=False)
         self.update_undo_redo_state()
 
     def redo(self):
-        if not self.redo_stack: return
-        self.undo_stack.append(copy.deepcopy(self.temp_annots))
-        self.temp_annots = self.redo_stack.pop()
+        if not self.history.can_redo: return
+        self.apply_annot_ops(self.history.redo())
         self.render_current_page(reset_scroll=False)
         self.update_undo_redo_state()
 
+    # --- Thumbnails ---
+    def toggle_thumbnails(self):
+        if self.thumbs_var.get():
+            self.thumb_strip.pack(side=tk.LEFT, fill=tk.Y, before=self.v_scroll)
+            if self.pdf_document: self.start_thumbnails()
+        else:
+            self.thumb_strip.pack_forget()
+            self.stop_thumbnails()
+
+    def start_thumbnails(self, stale=()):
+        """Renders the missing thumbnails of the shown document, and again those of the stale pages."""
+        self.stop_thumbnails()
+        if not self.thumbs_var.get(): return
+        done = set(self.thumbnails).difference(stale)
+        if self.thumb_pool is None: self.thumb_pool = ProcessPoolExecutor(max_workers=1)
+        self.thumb_renderer = ThumbnailRenderer(self.root, self.thumb_pool, self.index_db_path, self.current_file_path, self.on_thumbnail, done)
+        self.prioritize_thumbnails()
+
+    def stop_thumbnails(self):
+        """Stops rendering thumbnails. Returns the futures of the worker closing the file, so it can be renamed or replaced."""
+        if not self.thumb_renderer: return []
+        self.thumb_renderer.cancel()
+        self.thumb_renderer = None
+        return [self.thumb_pool.submit(release_render_document)]
+
+    def prioritize_thumbnails(self):
+        """Has the pages in the strip's view rendered first, then the others outward from the current page."""
+        if not self.thumb_renderer: return
+        nearby = sorted(range(len(self.pdf_document)), key=lambda p: abs(p - self.current_page))
+        self.thumb_renderer.prioritize(list(self.thumb_strip.visible_pages()) + nearby)
+
+    def on_thumbnail(self, renderer, page_num, jpeg):
+        if renderer is not self.thumb_renderer: return
+        self.thumbnails[page_num] = jpeg
+        self.thumb_strip.refresh_page(page_num)
+
+    def on_thumbnail_click(self, page_num):
+        if not self.pdf_document: return
+        if self.layout_key: return self.go_to_page(page_num)
+        self.current_page = page_num
+        self.show_thumbnail_preview(page_num)
+        self.render_current_page(reset_scroll=True)
+
+    def show_thumbnail_preview(self, page_num):
+        """Shows a page's thumbnail scaled up to the page's size on screen, to stand in while the page is rendered."""
+        data = self.thumbnails.get(page_num)
+        page = self.get_page(page_num)
+        zoom = self.get_page_zoom(page)
+        if not data or self.use_tiles(page, zoom) or self.page_cache.get((self.doc_key, page_num, round(zoom, 4))) is not None: return
+        rect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+        self.clear_page_view()
+        with Image.open(io.BytesIO(data)) as image:
+            self.preview_image = ImageTk.PhotoImage(image.resize((rect.width, rect.height), Image.BILINEAR))
+        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.preview_image, tags="page")
+        self.canvas.config(scrollregion=(0, 0, rect.width, rect.height))
+        self.canvas.yview_moveto(0)
+        # Paint it now; the sharp render that follows keeps the event loop busy.
+        self.root.update_idletasks()
+
+    # --- Find ---
+    def start_text_index(self):
+        if self.text_builder: self.text_builder.cancel()
+        self.text_index = TextIndex()
+        self.text_page_count = len(self.pdf_document)
+        self.search_hits, self.search_pos = [], -1
+        self.text_builder = TextIndexBuilder(self.root, self.index_db_path, self.current_file_path, self.on_text_pages)
+
+    def on_text_pages(self, builder, pages, page_count):
+        # Documents in background tabs keep indexing.
+        doc = self if builder is self.text_builder else next((d for d in self.open_docs.values() if d.text_builder is builder), None)
+        if doc is None: return
+        for page_num, words in pages.items(): doc.text_index.add_page(page_num, words)
+        doc.text_page_count = page_count
+        if doc is not self: return
+        if self.search_query: self.run_search()
+        else: self.update_find_status()
+
+    def open_find_bar(self):
+        self.find_bar.pack(fill=tk.X, after=self.top_bar)
+        self.find_entry.focus_set()
+        self.find_entry.select_range(0, tk.END)
+
+    def close_find_bar(self):
+        self.find_bar.pack_forget()
+        self.search_query, self.search_hits, self.search_pos = "", [], -1
+        self.canvas.delete("search_hit")
+        self.canvas.focus_set()
+
+    def run_search(self):
+        """Searches the words indexed so far, keeping the current hit if it is still there."""
+        current = self.search_hits[self.search_pos][:2] if 0 <= self.search_pos < len(self.search_hits) else None
+        self.search_hits = self.text_index.search(self.search_query)
+        keys = [hit[:2] for hit in self.search_hits]
+        self.search_pos = keys.index(current) if current in keys else -1
+        self.update_find_status()
+        self.draw_search_hits()
+
+    def find_next(self, step):
+        """Moves to the next or previous hit, searching first if the query changed."""
+        if not self.pdf_document: return
+        query = self.find_var.get().strip()
+        if query != self.search_query:
+            self.search_query = query
+            self.search_pos = -1
+            self.run_search()
+        if not self.search_hits: return
+        if self.search_pos == -1:
+            # Start from the page being read rather than from the top of the document.
+            pages = [hit[0] for hit in self.search_hits]
+            self.search_pos = bisect.bisect_left(pages, self.current_page) if step > 0 else bisect.bisect_right(pages, self.current_page) - 1
+            self.search_pos %= len(self.search_hits)
+        else: self.search_pos = (self.search_pos + step) % len(self.search_hits)
+        self.show_search_hit()
+
+    def show_search_hit(self):
+        page_num, _, rect = self.search_hits[self.search_pos]
+        if not self.layout_key and page_num != self.current_page:
+            self.current_page = page_num
+            self.render_current_page(reset_scroll=True)
+        zoom = self.get_current_zoom()
+        top = self.page_origin(page_num)[1] + rect.y0 * zoom
+        total = self.layout_height if self.layout_key else self.get_page(page_num).rect.height * zoom
+        # Put the hit a third of the way down the window.
+        self.canvas.yview_moveto(max(0, top - self.canvas.winfo_height() / 3) / total)
+        self.update_find_status()
+        self.draw_search_hits()
+
+    def draw_search_hits(self):
+        """Draws the hits on the pages currently on the canvas, the current one in orange."""
+        self.canvas.delete("search_hit")
+        if not self.search_hits: return
+        pages = set(self.placed_pages) | set(self.tiled_pages) if self.layout_key else {self.current_page}
+        zoom = self.get_current_zoom()
+        for pos, (page_num, _, rect) in enumerate(self.search_hits):
+            if page_num not in pages: continue
+            origin_x, origin_y = self.page_origin(page_num)
+            color = "orange" if pos == self.search_pos else "cyan"
+            self.canvas.create_rectangle(origin_x + rect.x0 * zoom, origin_y + rect.y0 * zoom, origin_x + rect.x1 * zoom, origin_y + rect.y1 * zoom,
+                                         outline=color, width=2, fill=color, stipple="gray25", tags="search_hit")
+
+    def open_library_search(self):
+        if not self.current_folder: return
+        if self.library_window: self.library_window.window.lift()
+        else: self.library_window = LibrarySearchWindow(self)
+
+    def open_file_at(self, name, page_num, find=""):
+        """Opens a file of the current folder at a page and, given a query, finds it there."""
+        index = self.file_row(name)
+        if index is None: return
+        self.file_listbox.selection_set(index)
+        self.file_listbox.see(index)
+        self.show_document(os.path.join(self.current_folder, name), page_num)
+        if find:
+            self.find_var.set(find)
+            self.open_find_bar()
+            self.search_query, self.search_pos = find.strip(), -1
+            self.run_search()
+
+    def update_find_status(self):
+        if self.search_hits: text = f"{self.search_pos + 1 if self.search_pos >= 0 else '-'} of {len(self.search_hits)}"
+        elif self.search_query: text = "No matches"
+        else: text = ""
+        indexed = len(self.text_index.pages)
+        if indexed < self.text_page_count: text += f"  (indexing page {indexed} of {self.text_page_count})"
+        self.find_status.config(text=text)
+
     def update_undo_redo_state(self):
-        self.undo_button.config(state=tk.NORMAL if self.undo_stack else tk.DISABLED)
-        self.redo_button.config(state=tk.NORMAL if self.redo_stack else tk.DISABLED)
-        has_changes = bool(self.undo_stack)
+        self.undo_button.config(state=tk.NORMAL if self.history.can_undo else tk.DISABLED)
+        self.redo_button.config(state=tk.NORMAL if self.history.can_redo else tk.DISABLED)
+        has_changes = bool(self.dirty_pages)
         title = "PDF Viewer Application"
         if has_changes: title += "*"
+        if self.save_progress: title += " - Saving page %d of %d" % self.save_progress
+        elif self.save_thread: title += " - Saving"
         self.root.title(title)
+        self.update_tabs()
+
+    def save_pdf(self, show_success=True, then=None):
+        """Starts writing the pending annotation changes in the background; `then` runs once they are on disk.
+
+        Requests made while a write is running are coalesced into a single follow-up write.
+        """
+        if not self.pdf_document or not self.current_file_path: return
+        self._save_show_success |= show_success
+        if then: self._after_save.append(then)
+        if self.save_thread: self._save_again = True
+        else: self.start_save()
+
+    def start_save(self):
+        # The writer gets copies, so edits made during the write go into the next save.
+        path = self.current_file_path
+        with self.perf.stage("save_snapshot", pages=len(self.dirty_pages)):
+            snapshot = {p: [dict(a) for a in self.temp_annots[p]] for p in self.dirty_pages}
+            originals = {id(c): a for p in snapshot for c, a in zip(snapshot[p], self.temp_annots[p])}
+        self.dirty_pages.clear()
+        self.history.clear()
+        self._save_again = False
+        self.save_path = path
+        self.save_thread = threading.Thread(target=self._save_worker, args=(path, snapshot, originals), name="pdf-save")
+        self.save_thread.start()
+        self.update_undo_redo_state()
 
-    def save_pdf(self, show_success=True):
-        if not self.pdf_document or not self.current_file_path: return False
+    def _save_worker(self, path, snapshot, originals):
+        def post(*args):
+            # Once the window is closed there is no event loop left to report to, but the write still completes.
+            try: self.root.after(0, *args)
+            except (RuntimeError, tk.TclError): pass
         try:
-            doc = fitz.open(self.current_file_path)
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                for annot in page.annots(): page.delete_annot(annot)
-                
-                if page_num in self.temp_annots:
-                    for annot_data in self.temp_annots[page_num]:
-                        if annot_data['type'] == 'highlight':
-                            annot = page.add_highlight_annot(annot_data['quads'])
-                            annot.set_colors(stroke=annot_data['color']); annot.update()
-                        elif annot_data['type'] == 'text':
-                            annot = page.add_freetext_annot(annot_data['rect'], annot_data['text'], fontname="helv", fontsize=11, text_color=annot_data['color'])
-            
-            doc.save(self.current_file_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
-            doc.close()
-            if show_success: messagebox.showinfo("Save Successful", f"Annotations saved to\n{os.path.basename(self.current_file_path)}")
-            
-            self.undo_stack.clear(); self.redo_stack.clear(); self.update_undo_redo_state()
-            return True
-        except Exception as e:
-            messagebox.showerror("Save Error", f"Could not save file: {e}")
-            return False
+            old_stat = (os.path.getsize(path), os.path.getmtime(path))
+            with self.perf.stage("save_pdf", file=os.path.basename(path), pages=len(snapshot)):
+                temp_path, added = write_annots_copy(path, snapshot, lambda done, total: post(self.on_save_progress, done, total)) if snapshot else (None, [])
+                error = None
+        except Exception as e: old_stat, temp_path, added, error = None, None, [], e
+        # The copy is swapped in on the Tk thread, which can make the viewer and the render workers let go of the file.
+        post(self.on_save_done, path, old_stat, snapshot, originals, temp_path, added, error)
+
+    def on_save_progress(self, done, total):
+        if self.save_thread: self.save_progress = (done, total); self.update_undo_redo_state()
+
+    def on_save_done(self, path, old_stat, snapshot, originals, temp_path, added, error):
+        self.save_thread = None
+        self.save_path = None
+        self.save_progress = None
+        doc = self.document_for(path)
+        if temp_path: error = self.replace_with_saved_copy(doc, temp_path, path)
+        if not error:
+            for annot_data, xref in added: originals[id(annot_data)]['xref'] = xref
+        if error:
+            if doc: doc.dirty_pages.update(snapshot)
+            self._after_save, self._save_show_success = [], False
+            messagebox.showerror("Save Error", f"Could not save file: {error}")
+        else:
+            # The watcher will see this write; it must not be mistaken for another program's.
+            if doc: doc.saved_mtime = os.path.getmtime(path); self.reopen_saved_document(doc)
+            # The text store shares the index file, where the folder index may hold an open write transaction on this thread.
+            if self._index_commit_job: self.root.after_cancel(self._index_commit_job); self.commit_folder_index()
+            new_stat = (os.path.getsize(path), os.path.getmtime(path))
+            self.text_store.revalidate(path, old_stat, new_stat)
+            # Only the thumbnails of the pages whose annotations were saved have changed.
+            if doc is self: self.stop_thumbnails()
+            self.thumb_store.revalidate(path, old_stat, new_stat, snapshot)
+            if doc is self: self.start_thumbnails(stale=snapshot)
+            elif doc:
+                for page_num in snapshot: doc.thumbnails.pop(page_num, None)
+            if self._save_again and self.dirty_pages: return self.start_save()
+            callbacks, self._after_save = self._after_save, []
+            if self._save_show_success: messagebox.showinfo("Save Successful", f"Annotations saved to\n{os.path.basename(path)}")
+            self._save_show_success = False
+            for callback in callbacks: callback()
+        self.update_undo_redo_state()
+
+    def replace_with_saved_copy(self, doc, temp_path, path):
+        """Swaps the copy a save wrote in for the file. Returns the error if that failed, leaving the file as it was."""
+        try: return os.replace(temp_path, path)
+        except PermissionError:
+            # Windows cannot replace a file that is open, so everything of ours lets go of it first. This waits for
+            # renders the workers are in the middle of; elsewhere the first attempt succeeds.
+            if doc is self: wait(self.prefetcher.cancel() + self.refiner.cancel() + self.stop_thumbnails())
+            if doc: doc.pdf_document.close()
+        try: return os.replace(temp_path, path)
+        except OSError as e:
+            os.remove(temp_path)
+            if doc: self.reopen_saved_document(doc)
+            if doc is self: self.start_thumbnails()
+            return e
+
+    def reopen_saved_document(self, doc):
+        """Reopens a document from the file it was just saved to, so the viewer and the render workers show the same version."""
+        old_key = doc.doc_key
+        if not doc.pdf_document.is_closed: doc.pdf_document.close()
+        doc.pdf_document = fitz.open(doc.current_file_path)
+        doc.doc_key = (doc.current_file_path, os.path.getmtime(doc.current_file_path))
+        doc.pages, doc.page_widths, doc.display_lists = OrderedDict(), {}, {}
+        if doc.doc_key != old_key: self.page_cache.discard_where(lambda key: key[0] == old_key)
+        if doc is self:
+            view_y = self.canvas.yview()[0]
+            self.clear_page_view()
+            self.render_current_page()
+            if self.layout_key: self.canvas.yview_moveto(view_y)
 
     def show_context_menu(self, event):
         listbox_index = self.file_listbox.nearest(event.y)
@@ -524,14 +2384,19 @@ class PDFViewerApp:
         self.file_listbox.selection_clear(0, tk.END); self.file_listbox.selection_set(listbox_index)
         
         context_menu = tk.Menu(self.root, tearoff=0)
-        context_menu.add_command(label="Rename", command=lambda: self.rename_file(listbox_index))
+        context_menu.add_command(label="Rename", command=lambda: self.rename_file(os.path.join(self.current_folder, self.pdf_files[listbox_index])))
         context_menu.tk_popup(event.x_root, event.y_root)
 
-    def rename_file(self, index):
-        if self.undo_stack:
-            if not self.save_pdf(show_success=False): return
+    def rename_file(self, path):
+        # The list may have changed while a save ran, so the row is looked up by name, and only in the same folder.
+        folder, old_name = os.path.split(path)
+        index = self.file_row(old_name) if folder == self.current_folder else None
+        if index is None: return
+        # A file with unsaved annotations in a background tab is brought forward so they are saved first.
+        pooled = self.open_docs.get(path)
+        if pooled and pooled.dirty_pages: self.show_document(pooled.current_file_path)
+        if self.dirty_pages or self.save_thread: return self.save_pdf(show_success=False, then=lambda: self.rename_file(path))
 
-        old_name = self.pdf_files[index]
         dialog = RenameDialog(self.root, "Rename File", initialvalue=old_name)
         new_name = dialog.result
 
@@ -541,34 +2406,75 @@ class PDFViewerApp:
             new_path = os.path.join(self.current_folder, new_name)
             
             try:
-                if self.current_file_path == old_path and self.pdf_document:
-                    self.pdf_document.close(); self.pdf_document = None
-                    self.canvas.delete("all"); self.current_file_path = ""
+                if os.path.exists(new_path): raise FileExistsError(f"{new_name} already exists")
+                # An open document would keep the file locked on Windows.
+                if old_path in self.tabs: self.drop_document(old_path)
                 os.rename(old_path, new_path)
-                self.select_folder(self.current_folder, file_to_select=new_name)
+                self.folder_index.rename(self.current_folder, old_name, new_name)
+                self.page_cache.discard_where(lambda key: key[0][0] == old_path)
+                # Move the one row instead of listing the folder again.
+                del self.pdf_files[index]
+                self.file_info[new_name] = self.file_info.pop(old_name)
+                new_index = bisect.bisect_left(self.pdf_files, new_name)
+                self.pdf_files.insert(new_index, new_name)
+                self.file_listbox.set_count(len(self.pdf_files))
+                self.file_listbox.selection_set(new_index)
+                self.file_listbox.see(new_index)
+                self.on_file_select(None)
             except Exception as e:
                 messagebox.showerror("Rename Error", f"Could not rename file: {e}")
     
-    def load_last_folder(self):
-        """Loads the last opened folder from the config file on startup."""
+    # --- Session ---
+    def restore_session(self):
+        """Reopens the folder, file, page, zoom and scroll position of the last session on startup."""
+        session = {}
         try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r') as f:
-                    last_folder = f.read().strip()
-                if os.path.isdir(last_folder):
-                    self.select_folder(folder_path=last_folder)
+            if os.path.exists(self.session_path):
+                with open(self.session_path, 'r', encoding='utf-8') as f: session = json.load(f)
+            elif os.path.exists(self.config_path):
+                # Older versions only kept the last folder, in a text file.
+                with open(self.config_path, 'r') as f: session = {'folder': f.read().strip()}
         except Exception as e:
-            print(f"Could not load last folder: {e}")
-
-    def save_last_folder(self, folder_path):
-        """Saves the last opened folder path to the config file."""
+            print(f"Could not load last session: {e}")
+        folder = session.get('folder')
+        if not folder or not os.path.isdir(folder): return self.mark_interactive()
+        zoom = session.get('zoom')
+        if isinstance(zoom, str) and (zoom == "Page Width" or zoom.rstrip('%').isdigit()): self.zoom_var.set(zoom)
+        self.continuous_var.set(bool(session.get('continuous')))
+        # Lay the window out first, so the restored page is rendered at the canvas size.
+        self.root.update_idletasks()
+        self.select_folder(folder_path=folder, file_to_select=session.get('file'), page_num=session.get('page'), scroll=session.get('scroll'))
+
+    def save_session(self):
+        """Writes the folder, file, page, zoom and scroll position to the session file, replacing it atomically."""
+        if not self.current_folder: return
+        session = {'folder': self.current_folder, 'zoom': self.zoom_var.get(), 'continuous': bool(self.continuous_var.get())}
+        if self.pdf_document and os.path.dirname(self.current_file_path) == self.current_folder:
+            session.update(file=os.path.basename(self.current_file_path), page=self.current_page, scroll=round(self.canvas.yview()[0], 4))
         try:
-            with open(self.config_path, 'w') as f:
-                f.write(folder_path)
+            with open(self.session_path + ".tmp", 'w', encoding='utf-8') as f: json.dump(session, f)
+            os.replace(self.session_path + ".tmp", self.session_path)
         except Exception as e:
-            print(f"Could not save config file: {e}")
+            print(f"Could not save session: {e}")
+
+    def mark_interactive(self):
+        """Records the time from process start until the restored session was on screen with the event loop idle."""
+        if not self._startup_pending: return
+        self._startup_pending = False
+        self.perf.record("startup", (time.perf_counter() - START_TIME) * 1000)
+
+    def on_close(self):
+        self.save_session()
+        # A running save only swaps its copy in on this thread, so let it finish first.
+        while self.save_thread:
+            self.save_thread.join()
+            self._save_again, self._after_save, self._save_show_success = False, [], False
+            self.root.update()
+        self.root.destroy()
 
 if __name__ == "__main__":
+    # In a frozen build the worker processes start this executable; this runs their job instead of another window.
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = PDFViewerApp(root)
     root.mainloop()
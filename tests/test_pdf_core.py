@@ -0,0 +1,135 @@
+"""Tests of the GUI-free logic: annotation round trips, the word index and the viewer's caches. Run with pytest from the repository root."""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+fitz = pytest.importorskip("fitz")
+from pdf_core import TextIndex, annot_from_json, annot_to_json, da_text_color, make_highlight, read_page_annots, write_page_annots
+
+def reopened_page(tmp_path, page_annots):
+    """Writes annotations into a new one-page PDF, saves it and returns the first page of the reopened file."""
+    doc = fitz.open()
+    write_page_annots(doc.new_page(), page_annots)
+    path = str(tmp_path / "annots.pdf")
+    doc.save(path)
+    doc.close()
+    return fitz.open(path).load_page(0)
+
+def test_round_trip_highlight_and_note(tmp_path):
+    quads = [fitz.Rect(50, 60, 200, 74).quad, fitz.Rect(50, 80, 120, 94).quad]
+    highlight = make_highlight(quads, (0, 0, 1))
+    note = {'type': 'text', 'rect': fitz.Rect(300, 300, 450, 340), 'text': "first line\nsecond line", 'color': (1, 0, 0)}
+    read = read_page_annots(reopened_page(tmp_path, [highlight, note]))
+
+    assert [a['type'] for a in read] == ['highlight', 'text']
+    assert tuple(read[0]['color']) == pytest.approx((0, 0, 1))
+    assert len(read[0]['quads']) == 2
+    for got, want in zip(read[0]['quads'], quads): assert tuple(got.rect) == pytest.approx(tuple(want.rect), abs=0.5)
+    assert read[1]['text'] == note['text']
+    assert tuple(read[1]['color']) == pytest.approx((1, 0, 0))
+    assert all(a['xref'] for a in read)
+
+def test_write_page_annots_deletes_dropped_annotations(tmp_path):
+    page = reopened_page(tmp_path, [make_highlight([fitz.Rect(50, 60, 200, 74).quad], (1, 1, 0)),
+                                    {'type': 'text', 'rect': fitz.Rect(300, 300, 450, 340), 'text': "note", 'color': (0, 0, 0)}])
+    kept = [a for a in read_page_annots(page) if a['type'] == 'text']
+    assert write_page_annots(page, kept) == []
+    assert [a['type'] for a in read_page_annots(page)] == ['text']
+
+@pytest.mark.parametrize("da, color", [("1 0 0 rg /Helv 11 Tf", (1, 0, 0)), ("/Helv 11 Tf 0.5 g", (0.5, 0.5, 0.5)),
+                                       ("0 0 0 1 k /Helv 11 Tf", (0, 0, 0)), ("/Helv 11 Tf", (0, 0, 0)), ("null", (0, 0, 0))])
+def test_da_text_color(da, color):
+    assert da_text_color(da) == pytest.approx(color)
+
+def test_json_round_trip():
+    highlight = make_highlight([fitz.Rect(10, 20, 110, 32).quad], (1, 0.5, 0))
+    note = {'type': 'text', 'rect': fitz.Rect(5, 6, 70, 40), 'text': "hello", 'color': (0, 0, 1)}
+    entries = [annot_to_json(3, highlight), annot_to_json(0, note)]
+    assert [e['page'] for e in entries] == [4, 1]
+
+    back = [annot_from_json(e) for e in entries]
+    assert back[0]['type'] == 'highlight' and back[0]['color'] == (1, 0.5, 0)
+    assert tuple(back[0]['quads'][0].rect) == pytest.approx(tuple(highlight['quads'][0].rect))
+    assert back[0]['rect'] == highlight['rect']
+    assert back[1] == {'type': 'text', 'rect': note['rect'], 'text': "hello", 'color': (0, 0, 1)}
+
+def test_json_highlight_from_rect_and_unknown_type():
+    highlight = annot_from_json({'type': 'highlight', 'rect': [10, 20, 110, 32]})
+    assert highlight['rect'] == fitz.Rect(10, 20, 110, 32) and highlight['color'] == (1, 1, 0)
+    with pytest.raises(ValueError): annot_from_json({'type': 'ink', 'rect': [0, 0, 1, 1]})
+
+def make_words(texts, y=0):
+    return [(i * 50.0, y, i * 50.0 + 40, y + 10, text) for i, text in enumerate(texts)]
+
+@pytest.fixture
+def text_index():
+    index = TextIndex()
+    index.add_page(0, make_words(["The", "quick", "brown", "fox."]))
+    index.add_page(2, make_words(["a", "Quick", "“brown”", "bear", "quicksand"]))
+    return index
+
+def test_search_phrase(text_index):
+    hits = text_index.search("quick brown")
+    assert [(page, i) for page, i, _ in hits] == [(0, 1), (2, 1)]
+    assert hits[0][2] == fitz.Rect(50, 0, 140, 10)
+
+def test_search_prefix(text_index):
+    assert [(page, i) for page, i, _ in text_index.search("quick")] == [(0, 1), (2, 1), (2, 4)]
+    assert [(page, i) for page, i, _ in text_index.search("brown f")] == [(0, 2)]
+    assert [(page, i) for page, i, _ in text_index.search("bro")] == [(0, 2), (2, 2)]
+
+def test_search_misses(text_index):
+    assert text_index.search("fox brown") == []
+    assert text_index.search("  ...  ") == []
+    assert text_index.search("the quick brown fox jumps") == []
+
+@pytest.fixture
+def viewer(): return pytest.importorskip("pdf_viewer_reload")
+
+def test_spatial_grid_matches_rect_intersects(viewer):
+    rng = random.Random(1)
+    grid, rects = viewer.SpatialGrid(cell_size=20), {}
+    for key in range(300):
+        x, y = rng.uniform(0, 500), rng.uniform(0, 700)
+        rects[key] = fitz.Rect(x, y, x + rng.uniform(0, 60), y + rng.uniform(0, 15))
+        grid.insert(key, rects[key])
+    for key in range(0, 300, 7):
+        grid.remove(key)
+        del rects[key]
+    for _ in range(200):
+        x, y = rng.uniform(-20, 520), rng.uniform(-20, 720)
+        area = fitz.Rect(x, y, x + rng.uniform(1, 150), y + rng.uniform(1, 80))
+        assert grid.query(*area) == {key for key, rect in rects.items() if rect.intersects(area)}
+
+def test_page_cache_evicts_least_recently_used(viewer):
+    cache = viewer.PageCache(max_bytes=100)
+    for key in "abc": cache.put(key, key.upper(), 30)
+    assert cache.get("a") == "A"
+    cache.put("d", "D", 30)
+    assert cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["A", "C", "D"]
+    assert cache.current_bytes == 90
+
+def test_page_cache_replace_discard_and_oversized(viewer):
+    cache = viewer.PageCache(max_bytes=100)
+    cache.put("a", 1, 40)
+    cache.put("a", 2, 50)
+    assert cache.get("a") == 2 and cache.current_bytes == 50
+    cache.put("big", 3, 101)
+    assert cache.get("big") is None and cache.get("a") == 2
+    cache.put(("doc", 1), 4, 10)
+    cache.discard_where(lambda key: isinstance(key, tuple))
+    cache.discard("a")
+    assert cache.current_bytes == 0
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_annotated_image_at_thumbnail_zoom(viewer, monkeypatch, use_numpy):
+    if not use_numpy: monkeypatch.setattr(viewer, "np", None)
+    elif viewer.np is None: pytest.skip("NumPy is not installed")
+    note = {'type': 'text', 'rect': fitz.Rect(300, 300, 450, 340), 'text': "note", 'color': (1, 0, 0)}
+    highlight = make_highlight([fitz.Rect(50, 60, 200, 74).quad], (1, 1, 0))
+    base = viewer.raster_from_samples(40, 60, bytearray(b"\xff" * 40 * 60 * 3))
+    with viewer.annotated_image(base, [highlight, note], 0.05) as image: assert image.size == (40, 60)